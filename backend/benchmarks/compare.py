@@ -0,0 +1,95 @@
+"""
+Compare two benchmark runs and flag regressions.
+
+Usage (from backend/):
+    python benchmarks/compare.py BASELINE.json CANDIDATE.json [--threshold 0.10] [--min-delta-ms 2]
+
+For every endpoint in both runs, prints p50/p95/p99 latency and requests per
+second side by side. A latency percentile that grows by more than `threshold`
+(and by more than --min-delta-ms, so sub-millisecond noise is ignored) or a
+throughput that drops by more than `threshold` is a regression, as is any new
+error. Exits with status 1 if anything regressed, so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def load(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0 if after == 0 else float("inf")
+    return (after - before) / before
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    """
+    Print the side-by-side table and return a description of every regression.
+    """
+    regressions = []
+    for name in ("scenario", "journeys", "concurrency", "wrong_rate"):
+        if baseline["config"].get(name) != candidate["config"].get(name):
+            print(f"Warning: {name} differs ({baseline['config'].get(name)} vs {candidate['config'].get(name)}), "
+                  f"results may not be comparable")
+
+    print(f"{'endpoint':<18} {'metric':<7} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for endpoint, before in baseline["endpoints"].items():
+        after = candidate["endpoints"].get(endpoint)
+        if after is None:
+            print(f"{endpoint:<18} missing from candidate")
+            continue
+
+        for metric in LATENCY_METRICS:
+            delta = change(before[metric], after[metric])
+            regressed = delta > threshold and after[metric] - before[metric] > min_delta_ms
+            print(f"{endpoint:<18} {metric[:-3]:<7} {before[metric]:>10.1f} {after[metric]:>10.1f} "
+                  f"{delta:>+8.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{endpoint} {metric[:-3]} {before[metric]:.1f}ms -> {after[metric]:.1f}ms ({delta:+.1%})")
+
+        delta = change(before["rps"], after["rps"])
+        regressed = delta < -threshold
+        print(f"{endpoint:<18} {'rps':<7} {before['rps']:>10.1f} {after['rps']:>10.1f} "
+              f"{delta:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(f"{endpoint} rps {before['rps']:.1f} -> {after['rps']:.1f} ({delta:+.1%})")
+
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{endpoint} errors {before['errors']} -> {after['errors']}")
+
+    if candidate.get("journeys_failed", 0) > baseline.get("journeys_failed", 0):
+        regressions.append(f"failed journeys {baseline.get('journeys_failed', 0)} -> {candidate['journeys_failed']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"Baseline:  {baseline.get('label')} @ {baseline.get('git_revision')} ({baseline.get('timestamp')})")
+    print(f"Candidate: {candidate.get('label')} @ {candidate.get('git_revision')} ({candidate.get('timestamp')})\n")
+
+    regressions = compare(baseline, candidate, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Load-test the API with realistic user journeys, fully in-process.
+
+Usage (from backend/):
+    python benchmarks/run_benchmark.py [--scenario journey] [--journeys 200] [--concurrency 20] [--warmup 10]
+                                       [--wrong-rate 0.6] [--llm-latency-ms 800] [--label baseline]
+
+In the default "journey" scenario each journey is one user's visit: register,
+login, generate-session, analyze-mistakes, session-summary. The "register"
+scenario only signs users up, with --duplicate-rate of them reusing a taken
+username, to measure registration throughput (add --fast-hashing so argon2
+does not hide the database cost). Journeys run against the real app through
+httpx's ASGI transport (no sockets), with the app's lifespan, a throwaway
+SQLite database (or --database-url) and the mock LLM provider, so runs are
+repeatable and cost nothing.
+
+Prints p50/p95/p99 latency and requests per second per endpoint and writes
+the results to benchmarks/results/<timestamp>-<label>.json. Compare two runs
+with benchmarks/compare.py.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Add backend directory to path so we can import the app
+sys.path.append(BACKEND_DIR)
+
+ENDPOINTS = ("register", "register-duplicate", "login", "generate-session", "analyze-mistakes", "session-summary")
+PASSWORD = "bench-password-123"
+
+
+def configure_environment(args, workdir: str):
+    """
+    Point the app at throwaway state and the mock LLM. Must run before the app is
+    imported, since every service reads its configuration at import time.
+    """
+    database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    env = {
+        "DATABASE_URL": database_url,
+        "DATABASE_ECHO": "0",
+        "LLM_PROVIDER": "mock",
+        "MOCK_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "MOCK_LLM_LATENCY_DISTRIBUTION": args.llm_distribution,
+        "MOCK_LLM_ERROR_RATE": str(args.llm_error_rate),
+        "MOCK_LLM_SEED": str(args.seed),
+        "SESSION_STORE_BACKEND": "memory",
+        # Start cold: no precomputed or disk-cached diagnoses from earlier runs
+        "DIAGNOSIS_STORE_PATH": os.path.join(workdir, "diagnoses.db"),
+        "DIAGNOSIS_CACHE_DIR": "",
+        "QUESTION_BANK_POLL_SECONDS": "0",
+        "PROMPT_POLL_SECONDS": "0",
+    }
+    if database_url.startswith("sqlite"):
+        # SQLite has a single writer; with several pooled connections a failed INSERT
+        # under contention can deadlock on the lock upgrade until the busy timeout
+        env.update({"DATABASE_POOL_SIZE": "1", "DATABASE_MAX_OVERFLOW": "0"})
+    if args.no_llm_cache:
+        env["DIAGNOSIS_CACHE_MAX_ENTRIES"] = "0"
+    if args.fast_hashing:
+        env.update({"ARGON2_TIME_COST": "1", "ARGON2_MEMORY_COST_KIB": "1024", "ARGON2_PARALLELISM": "1"})
+    os.environ.update(env)
+    return env
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class Recorder:
+    """
+    Per-endpoint latencies and failures for the measured part of a run.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = True
+
+    async def call(self, endpoint: str, request, expected_status: int = 200):
+        """
+        Await an httpx request, timing it under `endpoint`. Any other status than
+        `expected_status` counts as an error.
+        """
+        start = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            if self.enabled:
+                self.errors[endpoint] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        if self.enabled:
+            self.latencies[endpoint].append(elapsed)
+            if response.status_code != expected_status:
+                self.errors[endpoint] += 1
+        if response.status_code != expected_status:
+            raise RuntimeError(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    def summary(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for endpoint in ENDPOINTS:
+            values = sorted(self.latencies.get(endpoint, []))
+            if not values:
+                continue
+            result[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "rps": len(values) / wall_seconds if wall_seconds else 0.0,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        return result
+
+
+async def journey(client, recorder: Recorder, run_id: str, index: int, rng: random.Random,
+                  wrong_rate: float, difficulty: str):
+    """
+    One user: sign up, log in, take a drill, get the mistakes analyzed, read the summary.
+    """
+    username = f"bench_{run_id}_{index}"
+    exam_date = (datetime.now() + timedelta(days=rng.randint(7, 120))).date().isoformat()
+
+    await recorder.call("register", client.post("/auth/register", json={
+        "username": username,
+        "email": f"{username}@bench.local",
+        "password": PASSWORD,
+        "exam_date": exam_date,
+    }))
+    login = await recorder.call("login", client.post("/auth/login", json={
+        "username": username, "password": PASSWORD
+    }))
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    session = (await recorder.call("generate-session", client.post("/generate-session", headers=headers, json={
+        "difficulty": difficulty, "exam_date": exam_date
+    }))).json()
+
+    answers = {}
+    for question in session["questions"]:
+        wrong = [o for o in question["options"] if o != question["correct_option"]]
+        if wrong and rng.random() < wrong_rate:
+            answers[question["id"]] = rng.choice(wrong)
+        else:
+            answers[question["id"]] = question["correct_option"]
+
+    analyses = (await recorder.call("analyze-mistakes", client.post("/analyze-mistakes", json={
+        "session_id": session["session_id"], "answers": answers
+    }))).json()
+
+    total = len(session["questions"])
+    await recorder.call("session-summary", client.post("/session-summary", json={
+        "session_id": session["session_id"],
+        "original_score": f"{total - len(analyses)}/{total}",
+        "final_mastery": f"{total}/{total}",
+        "traps_identified": sorted({a["user_mistake_diagnosis"]["trap_type"] for a in analyses}),
+        "exam_date": exam_date,
+    }))
+
+
+async def register_only(client, recorder: Recorder, run_id: str, index: int, rng: random.Random,
+                        duplicate_rate: float, registered: List[str]):
+    """
+    One sign-up; with `duplicate_rate` chance it reuses an already registered username and must be rejected.
+    """
+    if registered and rng.random() < duplicate_rate:
+        taken = rng.choice(registered)
+        await recorder.call("register-duplicate", client.post("/auth/register", json={
+            "username": taken, "email": f"other_{run_id}_{index}@bench.local", "password": PASSWORD
+        }), expected_status=400)
+        return
+
+    username = f"bench_{run_id}_{index}"
+    await recorder.call("register", client.post("/auth/register", json={
+        "username": username, "email": f"{username}@bench.local", "password": PASSWORD
+    }))
+    registered.append(username)
+
+
+async def run_journeys(client, recorder: Recorder, run_id: str, start: int, count: int,
+                       concurrency: int, args) -> int:
+    """
+    Run `count` journeys with at most `concurrency` in flight. Returns how many failed.
+    """
+    next_index = start
+    failed = 0
+    registered: List[str] = []
+
+    async def worker():
+        nonlocal next_index, failed
+        while next_index < start + count:
+            index = next_index
+            next_index += 1
+            # Seeded per journey so every run answers the same questions the same way
+            rng = random.Random(f"{args.seed}-{index}")
+            difficulty = args.difficulty or rng.choice(["Beginner", "Intermediate", "Advanced"])
+            try:
+                if args.scenario == "register":
+                    await register_only(client, recorder, run_id, index, rng, args.duplicate_rate, registered)
+                else:
+                    await journey(client, recorder, run_id, index, rng, args.wrong_rate, difficulty)
+            except Exception as e:
+                failed += 1
+                if failed <= 5:
+                    print(f"[Benchmark] Journey {index} failed: {e}")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, count)))))
+    return failed
+
+
+def component_stats() -> Dict[str, object]:
+    """
+    Snapshot of the services' own counters, to explain a latency change.
+    """
+    from database import pool_stats
+    from services.drill_recorder import drill_recorder
+    from services.llm_cache import diagnosis_cache
+    from services.llm_providers import llm_provider
+    from services.llm_scheduler import llm_scheduler
+    from services.llm_service import llm_breaker, llm_singleflight
+    from services.hedging import llm_hedger
+    from services.prompt_registry import prompt_registry
+    from services.trap_classifier import trap_classifier
+
+    stats = {}
+    for name, component in (
+        ("diagnosis_cache", diagnosis_cache), ("llm_provider", llm_provider), ("llm_scheduler", llm_scheduler),
+        ("llm_singleflight", llm_singleflight), ("llm_breaker", llm_breaker), ("llm_hedger", llm_hedger),
+        ("prompt_registry", prompt_registry), ("trap_classifier", trap_classifier), ("drill_recorder", drill_recorder),
+    ):
+        try:
+            stats[name] = component.stats()
+        except Exception as e:
+            stats[name] = {"error": str(e)}
+    stats["database_pool"] = pool_stats()
+    return stats
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args, env: Dict[str, str]) -> Dict[str, object]:
+    import httpx
+    from database import Base, engine
+    import models  # noqa: F401  (registers the tables on Base.metadata)
+    from main import app
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    run_id = datetime.now().strftime("%H%M%S%f")
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            if args.warmup:
+                recorder.enabled = False
+                await run_journeys(client, recorder, run_id, 0, args.warmup, args.concurrency, args)
+                recorder.enabled = True
+
+            started = time.perf_counter()
+            failed = await run_journeys(client, recorder, run_id, args.warmup, args.journeys, args.concurrency, args)
+            wall_seconds = time.perf_counter() - started
+        stats = component_stats()
+
+    await engine.dispose()
+
+    return {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "config": {
+            "scenario": args.scenario,
+            "journeys": args.journeys,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "wrong_rate": args.wrong_rate,
+            "duplicate_rate": args.duplicate_rate,
+            "difficulty": args.difficulty,
+            "seed": args.seed,
+            "environment": {k: v for k, v in env.items() if not k.endswith("_PATH") and k != "DATABASE_URL"},
+            "database": env["DATABASE_URL"].split(":", 1)[0],
+        },
+        "wall_seconds": wall_seconds,
+        "journeys_failed": failed,
+        "journeys_per_second": (args.journeys - failed) / wall_seconds if wall_seconds else 0.0,
+        "endpoints": recorder.summary(wall_seconds),
+        "components": stats,
+    }
+
+
+def print_report(result: Dict[str, object]):
+    print(f"\n{result['config']['journeys']} journeys at concurrency {result['config']['concurrency']} "
+          f"in {result['wall_seconds']:.2f}s ({result['journeys_per_second']:.1f} journeys/s, "
+          f"{result['journeys_failed']} failed)\n")
+    print(f"  {'endpoint':<18} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, row in result["endpoints"].items():
+        print(f"  {endpoint:<18} {row['requests']:>6} {row['errors']:>5} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user journeys against the in-process app")
+    parser.add_argument("--scenario", choices=["journey", "register"], default="journey")
+    parser.add_argument("--journeys", type=int, default=200, help="Measured journeys")
+    parser.add_argument("--concurrency", type=int, default=20, help="Journeys in flight at once")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured journeys run first")
+    parser.add_argument("--wrong-rate", type=float, default=0.6, help="Chance of answering each question wrong")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1,
+                        help="Register scenario: chance of re-registering a taken username")
+    parser.add_argument("--fast-hashing", action="store_true", help="Use minimal argon2 costs")
+    parser.add_argument("--difficulty", choices=["Beginner", "Intermediate", "Advanced"], default=None,
+                        help="Fixed difficulty (default: random per journey)")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Mock LLM median time to first token")
+    parser.add_argument("--llm-distribution", choices=["fixed", "uniform", "normal", "lognormal"], default="lognormal")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--no-llm-cache", action="store_true", help="Disable the in-memory diagnosis cache")
+    parser.add_argument("--database-url", default=None, help="Async SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="run", help="Name used in the results file")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<timestamp>-<label>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gre-bench-") as workdir:
+        env = configure_environment(args, workdir)
+        result = asyncio.run(run(args, env))
+
+    print_report(result)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,66 @@ FastAPI Backend for GRE Drill Sergeant MVP.
 Handles session generation, mistake analysis, and summary generation.
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from database import engine, warm_up_pool, pool_stats
 from routers import drill, auth
+from services.question_bank import question_bank, question_bank_watcher
+from services.prompt_registry import prompt_registry, prompt_registry_watcher
+from services.drill_recorder import drill_recorder
+from services.llm_providers import llm_provider
+from services.llm_cache import diagnosis_cache
+from services.llm_scheduler import llm_scheduler
+from services.llm_service import llm_breaker, llm_singleflight
+from services.hedging import llm_hedger
+from services.trap_classifier import trap_classifier
+from services.diagnosis_store import diagnosis_store
+from services.principal_cache import principal_cache
+from services.session_service import session_service
+from services.security import password_hasher
+from services.metrics import metrics
+from services.request_metrics import RequestMetricsMiddleware
 
 # ============================================================================
 # APP INITIALIZATION
 # ============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks."""
+    # Refuse to start with a misconfigured LLM provider (e.g. no LLM_API_KEY) rather than fail every request
+    llm_provider.check()
+    # Load and validate the whole question bank once, before serving requests
+    question_bank.load()
+    question_bank_watcher.start()
+    # Parse every prompt template once so rendering never reads from disk
+    prompt_registry.load()
+    prompt_registry_watcher.start()
+    # Drop expired and excess on-disk LLM results left by earlier runs
+    await diagnosis_cache.sweep()
+    drill_recorder.start()
+    # Pooled keep-alive connections to the LLM provider (or the offline mock), shared by every request
+    await llm_provider.start()
+    # Open pooled database connections now so the first requests skip connection setup
+    await warm_up_pool()
+    yield
+    await question_bank_watcher.stop()
+    await prompt_registry_watcher.stop()
+    # Flush buffered drill history before the process exits
+    await drill_recorder.stop()
+    await llm_provider.close()
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
 app = FastAPI(
     title="GRE Drill Sergeant API",
     description="High-intensity GRE Reading Comprehension drill backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware (allow frontend to call backend)
@@ -26,6 +74,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and in-flight requests, served on /metrics
+app.add_middleware(RequestMetricsMiddleware)
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+# Every component's own stats() counters are exported alongside the request metrics
+for component, stats in (
+    ("llm_provider", llm_provider.stats),
+    ("llm_scheduler", llm_scheduler.stats),
+    ("llm_breaker", llm_breaker.stats),
+    ("llm_singleflight", llm_singleflight.stats),
+    ("llm_hedger", llm_hedger.stats),
+    ("diagnosis_cache", diagnosis_cache.stats),
+    ("diagnosis_store", diagnosis_store.stats),
+    ("trap_classifier", trap_classifier.stats),
+    ("drill_recorder", drill_recorder.stats),
+    ("session_store", session_service.store.stats),
+    ("password_hasher", password_hasher.stats),
+    ("principal_cache", principal_cache.stats),
+    ("database_pool", pool_stats),
+):
+    metrics.register_stats(component, stats)
+metrics.register_stats("prompt_registry", prompt_registry.stats, label="template")
+
+session_store_size = metrics.gauge("session_store_sessions", "Drill sessions currently held by the session store")
+
 # ============================================================================
 # ROUTES
 # ============================================================================
@@ -38,6 +114,12 @@ async def root():
     """Health check endpoint."""
     return {"status": "alive", "service": "GRE Drill Sergeant API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    session_store_size.set(await session_service.store.size())
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # ============================================================================
 # RUN SERVER (for local development)
 # ============================================================================
@@ -15,3 +15,43 @@ class User(Base):
     streak_days = Column(Integer, default=0)
     exam_date = Column(DateTime, nullable=True)
 
+
+
+class DrillSession(Base):
+    __tablename__ = "drill_sessions"
+
+    id = Column(String, primary_key=True)  # session_id handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    difficulty = Column(String)
+    exam_date = Column(String, nullable=True)
+    passage_id = Column(String)
+    question_ids = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User")
+
+
+class DrillAttempt(Base):
+    __tablename__ = "drill_attempts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("drill_sessions.id"), index=True)
+    question_id = Column(Integer)
+    selected_option = Column(String)
+    correct_option = Column(String)
+    is_correct = Column(Boolean)
+    trap_type = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class DrillSummary(Base):
+    __tablename__ = "drill_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String, ForeignKey("drill_sessions.id"), index=True)
+    original_score = Column(String)
+    final_mastery = Column(String)
+    traps_identified = Column(JSON)
+    headline = Column(String, nullable=True)
+    body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
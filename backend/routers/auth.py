@@ -1,19 +1,62 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from jose import jwt, JWTError
 from database import get_db
 from models import User
 from schemas import UserCreate, UserResponse, LoginRequest, Token, UserUpdate
-from services.security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
+from services.principal_cache import principal_cache
+from services.security import password_hasher, PasswordHasherBusy, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
 from datetime import datetime, timedelta
+from typing import Optional
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+
+# Unique indexes on users and the error a colliding registration gets
+_UNIQUE_VIOLATIONS = (
+    ("email", "Email already registered"),
+    ("username", "Username already taken"),
+)
+
+
+def _duplicate_detail(error: IntegrityError) -> Optional[str]:
+    """
+    Map a unique violation back to its user-facing message. asyncpg reports the
+    index name (ix_users_email); SQLite only names the column (users.email).
+    """
+    cause = getattr(error.orig, "__cause__", None)
+    name = getattr(cause, "constraint_name", None) or str(error.orig)
+    for column, detail in _UNIQUE_VIOLATIONS:
+        if f"ix_users_{column}" in name or f"users.{column}" in name:
+            return detail
+    return None
+
+
+def _hasher_busy() -> HTTPException:
+    # Shed load instead of letting a login spike queue without bound
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts right now, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserResponse:
+    """
+    Resolve the bearer token to the caller's profile. Tokens seen recently are
+    answered from the principal cache without decoding or a query.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,35 +69,51 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    result = await db.execute(select(User).filter(User.username == username))
-    user = result.scalars().first()
-    if user is None:
+
+    # Tokens carry the user id, so the lookup is by primary key
+    user_id = payload.get("uid")
+    if user_id is not None:
+        user = await db.get(User, user_id)
+    else:
+        # Tokens issued before the uid claim was added
+        result = await db.execute(select(User).filter(User.username == username))
+        user = result.scalars().first()
+    if user is None or user.username != username:
         raise credentials_exception
-    return user
+
+    principal = UserResponse.model_validate(user)
+    principal_cache.put(token, principal, token_expires_at=payload.get("exp"))
+    return principal
+
+
+async def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Optional[int]:
+    """
+    Resolve the caller's user id for endpoints that also work anonymously.
+    Missing or invalid tokens yield None instead of a 401.
+    """
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+    # Tokens carry the user id, so the common case needs no query
+    user_id = payload.get("uid")
+    if user_id is not None:
+        return user_id
+
+    # Tokens issued before the uid claim was added
+    username = payload.get("sub")
+    if username is None:
+        return None
+    result = await db.execute(select(User.id).filter(User.username == username))
+    return result.scalars().first()
 
 
 @router.post("/register", response_model=UserResponse)
 async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    # 1. Check if email already exists
-    result = await db.execute(select(User).filter(User.email == user.email))
-    db_user_email = result.scalars().first()
-    if db_user_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="Email already registered"
-        )
-    
-    # 2. Check if username already exists
-    result = await db.execute(select(User).filter(User.username == user.username))
-    db_user_username = result.scalars().first()
-    if db_user_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="Username already taken"
-        )
-
-    # 3. Handle exam_date parsing
+    # 1. Handle exam_date parsing
     parsed_exam_date = None
     if user.exam_date:
         try:
@@ -70,20 +129,34 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
                     detail="Invalid exam_date format. Use ISO format or YYYY-MM-DD"
                 )
 
-    # 4. Create new user
-    hashed_password = get_password_hash(user.password)
-    new_user = User(
+    # 2. Hash the password (runs off the event loop)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    # 3. Create the user in one round trip; the unique indexes on email and
+    #    username reject duplicates atomically, with no check-then-insert race
+    stmt = insert(User).values(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password,
         streak_days=0,
         exam_date=parsed_exam_date
-    )
-    
+    ).returning(User)
+
     try:
-        db.add(new_user)
+        new_user = (await db.execute(stmt)).scalar_one()
         await db.commit()
-        await db.refresh(new_user)
+    except IntegrityError as e:
+        await db.rollback()
+        detail = _duplicate_detail(e)
+        if detail is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred while creating the user: {str(e)}"
+            )
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -99,29 +172,48 @@ async def login(form_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).filter(User.username == form_data.username))
     user = result.scalars().first()
 
-    # 2. Authenticate
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # 2. Authenticate (verification runs off the event loop)
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Upgrade hashes made with a deprecated scheme or older argon2 parameters
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        try:
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"[Auth] Failed to rehash password for user {user.id}: {e}")
     
     # 3. Create Access Token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id},
         expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserResponse = Depends(get_current_user)):
     return current_user
 
 @router.put("/me", response_model=UserResponse)
-async def update_user_me(user_update: UserUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def update_user_me(user_update: UserUpdate, current_user: UserResponse = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
     if user_update.exam_date is not None:
         try:
              # Try parsing ISO format (e.g. 2025-12-15T10:00:00)
@@ -135,16 +227,18 @@ async def update_user_me(user_update: UserUpdate, current_user: User = Depends(g
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid exam_date format. Use ISO format or YYYY-MM-DD"
                 )
-        current_user.exam_date = parsed_exam_date
+        user.exam_date = parsed_exam_date
     
     try:
         await db.commit()
-        await db.refresh(current_user)
+        await db.refresh(user)
     except Exception as e:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update user: {str(e)}"
         )
-    
-    return current_user
+
+    # Cached profiles of this user are now stale
+    principal_cache.invalidate_user(user.id)
+    return user
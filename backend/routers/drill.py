@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
 from schemas import (
     GenerateSessionRequest,
@@ -10,16 +12,17 @@ from schemas import (
     SessionSummaryResponse
 )
 from services.session_service import session_service
+from routers.auth import get_optional_user_id
 
 router = APIRouter()
 
 @router.post("/generate-session", response_model=GenerateSessionResponse)
-async def generate_session(request: GenerateSessionRequest):
+async def generate_session(request: GenerateSessionRequest, user_id: Optional[int] = Depends(get_optional_user_id)):
     """
     Generate a new GRE session with a passage and questions.
     """
     try:
-        return await session_service.create_session(request.difficulty, request.exam_date)
+        return await session_service.create_session(request.difficulty, request.exam_date, user_id=user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate session: {str(e)}")
 
@@ -34,7 +37,7 @@ async def analyze_mistakes(request: SubmitAnswersRequest):
         # Note: logic slightly changed from main.py which checked explicitly.
         # But service.analyze_mistakes returns None if session not found?
         # Let's check service implementation.
-        # It does: session = self.sessions.get(session_id); if not session: return None
+        # It does: session = await self.get_session(session_id); if not session: return None
         
         result = await session_service.analyze_mistakes(request.session_id, request.answers)
         
@@ -49,6 +52,28 @@ async def analyze_mistakes(request: SubmitAnswersRequest):
         raise HTTPException(status_code=500, detail=f"Failed to analyze mistakes: {str(e)}")
 
 
+@router.post("/analyze-mistakes/stream")
+async def analyze_mistakes_stream(request: SubmitAnswersRequest):
+    """
+    Stream mistake analyses as newline-delimited JSON, one AnalyzeMistakeResponse
+    per line, in the order they finish.
+    """
+    try:
+        results = await session_service.stream_mistake_analyses(request.session_id, request.answers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze mistakes: {str(e)}")
+
+    if results is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def ndjson():
+        async for analysis in results:
+            yield analysis.model_dump_json() + "\n"
+
+    # Disable proxy buffering so each line reaches the client immediately
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
 @router.post("/session-summary", response_model=SessionSummaryResponse)
 async def session_summary(request: SessionSummaryRequest):
     """
@@ -56,6 +81,7 @@ async def session_summary(request: SessionSummaryRequest):
     """
     try:
         return await session_service.generate_session_summary(
+            request.session_id,
             request.original_score,
             request.final_mastery,
             request.traps_identified,
@@ -64,3 +90,26 @@ async def session_summary(request: SessionSummaryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
+
+
+@router.post("/session-summary/stream")
+async def session_summary_stream(request: SessionSummaryRequest):
+    """
+    Stream the coach summary as newline-delimited JSON: "delta" events carry new
+    headline/body text as it is generated, and a final "summary" event carries the
+    validated SessionSummaryResponse. If generation fails after text was sent, the
+    stream ends with an "error" event instead.
+    """
+    events = session_service.stream_session_summary(
+        request.session_id,
+        request.original_score,
+        request.final_mastery,
+        request.traps_identified,
+        request.exam_date
+    )
+
+    async def ndjson():
+        async for event in events:
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
@@ -75,6 +75,9 @@ class Passage(BaseModel):
     title: str
     text: str
 
+    class Config:
+        frozen = True  # Shared across sessions by the question bank
+
 
 class Question(BaseModel):
     id: int
@@ -82,6 +85,9 @@ class Question(BaseModel):
     options: Dict[str, str]  # {"A": "option text", "B": "...", ...}
     correct_option: str  # "A", "B", "C", "D", or "E"
 
+    class Config:
+        frozen = True  # Shared across sessions by the question bank
+
 
 class GenerateSessionResponse(BaseModel):
     session_id: str = Field(default_factory=lambda: str(uuid4()))
@@ -116,9 +122,19 @@ class SessionSummaryResponse(BaseModel):
 # INTERNAL DATA STRUCTURES (Not exposed via API)
 # ============================================================================
 
+class SessionRef(BaseModel):
+    """Compact session record kept in the session store; resolved against the question bank."""
+    session_id: str
+    passage_id: str
+    question_ids: List[int]
+    difficulty: Literal["Beginner", "Intermediate", "Advanced"]
+    exam_date: str
+
+
 class SessionData(BaseModel):
-    """In-memory storage for session state (MVP only)."""
+    """Resolved session state: the passage and questions a SessionRef points to."""
     session_id: str
+    passage_id: str
     passage: Passage
     questions: List[Question]
     difficulty: Literal["Beginner", "Intermediate", "Advanced"]
@@ -0,0 +1,44 @@
+"""
+Compile backend/questions/*.json into a single memory-mappable pack file.
+
+Usage (from backend/):
+    python scripts/build_question_pack.py [--questions-dir questions] [--output questions.pack]
+
+Then start the server with QUESTION_PACK_PATH pointing at the output file.
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.question_bank import QUESTIONS_DIR, QuestionBank
+from services.question_pack import build_pack, PackedSnapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the packed question bank")
+    parser.add_argument("--questions-dir", default=QUESTIONS_DIR)
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(QUESTIONS_DIR), "questions.pack"))
+    args = parser.parse_args()
+
+    # Reuse the bank loader so the pack gets exactly the same validation
+    bank = QuestionBank(args.questions_dir, pack_path="")
+    snapshot = bank.load()
+    entries = [snapshot.get(passage_id) for passage_id in snapshot.all_ids]
+
+    size = build_pack(entries, args.output)
+
+    # Round-trip check before anyone points a server at it
+    packed = PackedSnapshot(args.output)
+    for entry in entries:
+        if packed.get(entry.passage_id) != entry:
+            sys.exit(f"Pack verification failed for {entry.passage_id}")
+
+    print(f"Wrote {len(entries)} passages to {args.output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Measure how often the local trap classifier agrees with the LLM.
+
+Usage (from backend/):
+    python scripts/evaluate_trap_classifier.py [--live] [--concurrency 4] [--fresh-only] [--json results.json]
+
+Every wrong option of every question in the bank is classified locally and
+compared with the LLM's trap_type for the same mistake, read from the
+precomputed diagnosis store (run scripts/precompute_diagnoses.py first).
+With --live, mistakes that have no stored diagnosis are sent to the LLM.
+
+Reports overall agreement, agreement per predicted trap, and for a range of
+confidence thresholds how many mistakes would be answered locally and how
+often those local answers agree with the LLM. Use it to pick
+TRAP_CLASSIFIER_MIN_CONFIDENCE.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Add parent directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.question_bank import question_bank
+from services.diagnosis_store import diagnosis_store
+from services.llm_service import render_mistake_prompt, diagnosis_fingerprint, request_diagnosis
+from services.llm_scheduler import PRIORITY_BATCH
+from services.llm_providers import llm_provider
+from services.trap_classifier import trap_classifier, TRAP_TEMPLATES
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.1)
+
+# Substrings that map the LLM's free-form trap names onto the classifier's labels
+_LABEL_KEYWORDS = (
+    ("extreme", "Extreme Language"),
+    ("scope", "Out of Scope"),
+    ("caus", "Correlation vs. Causation"),
+    ("correlation", "Correlation vs. Causation"),
+    ("distort", "Distortion"),
+)
+
+
+def normalize_trap(trap_type: str) -> str:
+    lowered = trap_type.lower()
+    for keyword, label in _LABEL_KEYWORDS:
+        if keyword in lowered:
+            return label
+    return "Other"
+
+
+async def reference_trap(entry, question, option, fresh_only: bool, live: bool,
+                         semaphore: asyncio.Semaphore) -> Optional[str]:
+    """
+    The LLM's trap_type for this mistake: stored diagnosis first, then (with --live) a new call.
+    """
+    prompt = render_mistake_prompt(entry.passage, question, option, question.correct_option)
+    stored, fresh = await diagnosis_store.lookup(
+        entry.passage_id, question.id, option, diagnosis_fingerprint(prompt)
+    )
+    if stored is not None and (fresh or not fresh_only):
+        return stored.trap_type
+    if not live:
+        return None
+    async with semaphore:
+        try:
+            return (await request_diagnosis(prompt, priority=PRIORITY_BATCH)).trap_type
+        except Exception as e:
+            print(f"  LLM failed for {entry.passage_id}/{question.id}/{option}: {e}")
+            return None
+
+
+async def run(live: bool, concurrency: int, fresh_only: bool, json_path: Optional[str]):
+    semaphore = asyncio.Semaphore(concurrency)
+    snapshot = question_bank.snapshot
+    cases = []
+    for passage_id in snapshot.all_ids:
+        entry = snapshot.get(passage_id)
+        for question in entry.questions:
+            for option, text in question.options.items():
+                if option != question.correct_option:
+                    cases.append((entry, question, option, trap_classifier.classify(entry.passage, text, question.text)))
+
+    try:
+        references = await asyncio.gather(*(
+            reference_trap(entry, question, option, fresh_only, live, semaphore)
+            for entry, question, option, _ in cases
+        ))
+    finally:
+        await llm_provider.close()
+
+    rows: List[Dict] = []
+    for (entry, question, option, guess), reference in zip(cases, references):
+        if reference is None:
+            continue
+        rows.append({
+            "passage_id": entry.passage_id,
+            "question_id": question.id,
+            "option": option,
+            "predicted": guess.trap_type,
+            "confidence": guess.confidence,
+            "overlap": round(guess.overlap, 4),
+            "llm_trap_type": reference,
+            "llm_label": normalize_trap(reference),
+            "agree": guess.trap_type == normalize_trap(reference),
+        })
+
+    print(f"{len(cases)} wrong options in bank, {len(rows)} with an LLM reference")
+    if not rows:
+        print("Nothing to compare: run scripts/precompute_diagnoses.py or pass --live")
+        return
+
+    agreed = sum(r["agree"] for r in rows)
+    print(f"Overall agreement: {agreed}/{len(rows)} ({agreed / len(rows):.1%})")
+
+    print("\nBy predicted trap:")
+    for label in list(TRAP_TEMPLATES):
+        subset = [r for r in rows if r["predicted"] == label]
+        if subset:
+            hits = sum(r["agree"] for r in subset)
+            print(f"  {label:<28} {hits:>4}/{len(subset):<4} ({hits / len(subset):.1%})")
+
+    print("\nLLM labels:", dict(Counter(r["llm_label"] for r in rows).most_common()))
+
+    print("\nThreshold  answered locally  agreement when local")
+    sweep = []
+    for threshold in THRESHOLDS:
+        local = [r for r in rows if r["confidence"] >= threshold]
+        hits = sum(r["agree"] for r in local)
+        share = len(local) / len(rows)
+        precision = hits / len(local) if local else 0.0
+        marker = "  <- current" if threshold == trap_classifier.min_confidence else ""
+        print(f"  {threshold:<8} {len(local):>5} ({share:6.1%})    {precision:6.1%}{marker}")
+        sweep.append({"threshold": threshold, "local": len(local), "share": share, "agreement": precision})
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"agreement": agreed / len(rows), "thresholds": sweep, "cases": rows}, f, indent=2)
+        print(f"\nWrote {json_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local trap classifier against LLM diagnoses")
+    parser.add_argument("--live", action="store_true", help="Ask the LLM for mistakes with no stored diagnosis")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent LLM calls with --live")
+    parser.add_argument("--fresh-only", action="store_true", help="Ignore stored diagnoses made from an older prompt")
+    parser.add_argument("--json", dest="json_path", help="Write per-case results to this file")
+    args = parser.parse_args()
+
+    # Fail before planning any work if the provider is misconfigured (e.g. no LLM_API_KEY)
+    if args.live:
+        llm_provider.check()
+
+    asyncio.run(run(args.live, args.concurrency, args.fresh_only, args.json_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Serve the mock LLM provider over an OpenAI-compatible HTTP API.
+
+Usage (from backend/):
+    python scripts/mock_llm_server.py [--port 8100] [--latency-ms 800] [--distribution lognormal]
+                                      [--jitter 0.4] [--error-rate 0] [--rate-limit-rate 0] [--hang-rate 0]
+
+Then run the backend against it with the real client path (HTTP pool, timeouts, SSE parsing).
+The server ignores the key, but the client needs one to start:
+    LLM_BASE_URL=http://127.0.0.1:8100 LLM_API_KEY=mock LLM_PROVIDER=openai python main.py
+
+Diagnosis cache keys include the base URL, so answers from this server never
+mix with the real provider's.
+
+Implements POST /chat/completions (JSON or SSE streaming) and GET /models,
+with and without the /v1 prefix. Injected errors come back as HTTP 500/429.
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import APIStatusError
+
+from services.llm_providers import MockProvider
+
+
+def create_app(provider: MockProvider) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stream = bool(body.pop("stream", False))
+        model = body.pop("model", "mock")
+        messages = body.pop("messages", [])
+        try:
+            result = await provider.chat_completion(model=model, messages=messages, stream=stream, **body)
+        except APIStatusError as e:
+            return JSONResponse({"error": {"message": e.message, "type": "mock_error"}}, status_code=e.status_code)
+
+        if not stream:
+            return JSONResponse(result.model_dump(exclude_none=True))
+
+        async def events():
+            async for chunk in result:
+                yield f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def models():
+        return {"object": "list", "data": [{"id": "deepseek-chat", "object": "model", "owned_by": "mock"}]}
+
+    for prefix in ("", "/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+        app.add_api_route(f"{prefix}/models", models, methods=["GET"])
+
+    @app.get("/stats")
+    async def stats():
+        return provider.stats()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "normal", "lognormal"], default=None)
+    parser.add_argument("--latency-ms", type=float, default=None, help="Median/mean time to first token")
+    parser.add_argument("--jitter", type=float, default=None, help="Lognormal sigma or relative spread")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=None, help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=None, help="Fraction of calls answered with HTTP 429")
+    parser.add_argument("--hang-rate", type=float, default=None, help="Fraction of calls that never answer")
+    parser.add_argument("--seed", default=None)
+    args = parser.parse_args()
+
+    # Flags override the MOCK_LLM_* environment defaults
+    overrides = {
+        "distribution": args.distribution,
+        "latency_ms": args.latency_ms,
+        "jitter": args.jitter,
+        "tokens_per_second": args.tokens_per_second,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "hang_rate": args.hang_rate,
+        "seed": args.seed,
+    }
+    provider = MockProvider(**{k: v for k, v in overrides.items() if v is not None})
+
+    import uvicorn
+    uvicorn.run(create_app(provider), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
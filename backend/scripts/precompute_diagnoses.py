@@ -0,0 +1,110 @@
+"""
+Precompute a MistakeDiagnosis for every wrong option of every question in the bank.
+
+Usage (from backend/):
+    python scripts/precompute_diagnoses.py [--concurrency 4] [--force] [--limit N] [--prune]
+
+Each result is committed as soon as it arrives, and entries whose prompt
+fingerprint is unchanged are skipped, so an interrupted run simply resumes
+where it stopped when started again. --force regenerates everything from the
+LLM, bypassing the response cache, and overwrites both the cache and the store.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path so we can import services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.question_bank import question_bank
+from services.diagnosis_store import diagnosis_store
+from services.llm_service import render_mistake_prompt, diagnosis_fingerprint, request_diagnosis
+from services.llm_scheduler import PRIORITY_BATCH
+from services.llm_providers import llm_provider
+
+
+def plan_jobs(force: bool):
+    """
+    Return (key, fingerprint, prompt) for every entry that needs (re)computing,
+    plus the full set of keys in the bank.
+    """
+    stored = {} if force else diagnosis_store.fingerprints()
+    jobs = []
+    all_keys = set()
+    snapshot = question_bank.snapshot
+    for passage_id in snapshot.all_ids:
+        entry = snapshot.get(passage_id)
+        for question in entry.questions:
+            for option in question.options:
+                if option == question.correct_option:
+                    continue
+                key = (passage_id, question.id, option)
+                all_keys.add(key)
+                prompt = render_mistake_prompt(entry.passage, question, option, question.correct_option)
+                fingerprint = diagnosis_fingerprint(prompt)
+                if stored.get(key) == fingerprint:
+                    continue
+                jobs.append((key, fingerprint, prompt))
+    return jobs, all_keys
+
+
+async def run(concurrency: int, force: bool, limit: int, prune: bool):
+    jobs, all_keys = plan_jobs(force)
+    print(f"{len(all_keys)} diagnoses in bank, {len(all_keys) - len(jobs)} up to date, "
+          f"{len(jobs)} stale or missing")
+    if limit:
+        jobs = jobs[:limit]
+    print(f"Generating {len(jobs)} (concurrency={concurrency})")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+    failed = 0
+    started = time.monotonic()
+
+    async def worker(key, fingerprint, prompt):
+        nonlocal done, failed
+        async with semaphore:
+            try:
+                diagnosis = await request_diagnosis(prompt, priority=PRIORITY_BATCH, use_cache=not force)
+            except Exception as e:
+                failed += 1
+                print(f"  failed {key}: {e}")
+                return
+            await diagnosis_store.put(*key, fingerprint, diagnosis)
+            done += 1
+            if done % 25 == 0:
+                print(f"  {done}/{len(jobs)} done ({time.monotonic() - started:.1f}s)")
+
+    try:
+        await asyncio.gather(*(worker(*job) for job in jobs))
+    finally:
+        await llm_provider.close()
+
+    if prune:
+        removed = diagnosis_store.prune(all_keys)
+        print(f"Pruned {removed} entries no longer in the bank")
+
+    print(f"Finished: {done} generated, {failed} failed in {time.monotonic() - started:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the precomputed diagnosis store")
+    parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent LLM calls")
+    parser.add_argument("--force", action="store_true", help="Regenerate every entry from the LLM, ignoring the store and the cache")
+    parser.add_argument("--limit", type=int, default=0, help="Only generate the first N missing entries")
+    parser.add_argument("--prune", action="store_true", help="Delete entries for questions no longer in the bank")
+    args = parser.parse_args()
+
+    # Fail before planning any work if the provider is misconfigured (e.g. no LLM_API_KEY)
+    llm_provider.check()
+
+    asyncio.run(run(args.concurrency, args.force, args.limit, args.prune))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Circuit breaker for the LLM provider.
+
+Outcomes of recent upstream calls are kept in a rolling time window. When
+too many fail, or take longer than the slow-call threshold, the circuit opens
+and calls fail immediately with CircuitOpenError, so callers can serve a local
+answer at once instead of waiting out a timeout. After a cool-down the circuit
+goes half-open and lets a few probe calls through: if they succeed it closes,
+otherwise it opens again.
+"""
+
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple, Type
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "30"))
+# Calls needed in the window before the error rate is trusted
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+# Fraction of failed (or slow) calls in the window that opens the circuit
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+# Calls slower than this count as failures
+LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "20"))
+# How long the circuit stays open before probing
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "15"))
+# Probe calls allowed at once while half-open; this many successes close the circuit
+LLM_BREAKER_HALF_OPEN_PROBES = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "2"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker driven by a rolling failure rate.
+
+        async with llm_breaker.guard():
+            response = await client.chat.completions.create(...)
+    """
+
+    def __init__(self, window_seconds: float = LLM_BREAKER_WINDOW_SECONDS,
+                 min_calls: int = LLM_BREAKER_MIN_CALLS,
+                 failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = LLM_BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+                 half_open_probes: int = LLM_BREAKER_HALF_OPEN_PROBES,
+                 ignored: Tuple[Type[BaseException], ...] = ()):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        # Exceptions that say nothing about provider health (e.g. 429s, handled by the scheduler)
+        self.ignored = ignored
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # (finished_at, failed, latency_seconds)
+        self._outcomes: Deque[Tuple[float, bool, float]] = deque()
+        self.opened = 0
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        if self.state != OPEN:
+            self.opened += 1
+            print(f"[CircuitBreaker] Open for {self.open_seconds:g}s")
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _close(self):
+        print("[CircuitBreaker] Closed, provider recovered")
+        self.state = CLOSED
+        self._outcomes.clear()
+
+    def allows_requests(self) -> bool:
+        """
+        Cheap check before queueing work: False while open and cooling down.
+        """
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def check(self):
+        """
+        Raise CircuitOpenError while open, before any work is queued for the provider.
+        """
+        if not self.allows_requests():
+            self.rejected += 1
+            raise CircuitOpenError("LLM circuit is open")
+
+    def _admit(self) -> bool:
+        if not self.allows_requests():
+            return False
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                return False
+            self._probes_in_flight += 1
+            return True
+        return True
+
+    def _end_probe(self):
+        # Re-opening resets the count, so a probe finishing afterwards must not go below zero
+        self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _record(self, failed: bool, latency: float, probe: bool):
+        now = time.monotonic()
+        if probe:
+            self._end_probe()
+            if self.state != HALF_OPEN:
+                return
+            if failed:
+                self._open(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._close()
+            return
+
+        self._outcomes.append((now, failed, latency))
+        self._trim(now)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for _, f, _ in self._outcomes if f)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    @asynccontextmanager
+    async def guard(self):
+        """
+        Wrap one upstream call. Raises CircuitOpenError without running the body
+        while the circuit is open (or half-open with all probe slots taken).
+        """
+        if not self._admit():
+            self.rejected += 1
+            raise CircuitOpenError("LLM circuit is open")
+
+        probe = self.state == HALF_OPEN
+        started = time.monotonic()
+        try:
+            yield
+        except self.ignored:
+            if probe:
+                self._end_probe()
+            raise
+        except Exception:
+            self._record(True, time.monotonic() - started, probe)
+            raise
+        except BaseException:
+            # Cancelled (deadline, hedge loser): no verdict on the provider
+            if probe:
+                self._end_probe()
+            raise
+        else:
+            latency = time.monotonic() - started
+            self._record(latency > self.slow_call_seconds, latency, probe)
+
+    def stats(self) -> Dict[str, object]:
+        self._trim(time.monotonic())
+        calls = len(self._outcomes)
+        failures = sum(1 for _, f, _ in self._outcomes if f)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+            "window_avg_latency_seconds": round(sum(l for _, _, l in self._outcomes) / calls, 4) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
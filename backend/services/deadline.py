@@ -0,0 +1,45 @@
+"""
+Request deadlines.
+
+A Deadline is created once per request and handed down to every call made on
+its behalf, so nested work shares one time budget instead of each call having
+its own timeout.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    A point in time (monotonic clock) by which a request must be answered.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+async def within(deadline: Optional[Deadline], awaitable: Awaitable[T]) -> T:
+    """
+    Await `awaitable`, raising asyncio.TimeoutError once the deadline passes.
+    No deadline means no limit.
+    """
+    if deadline is None:
+        return await awaitable
+    if deadline.expired:
+        # Do not start work that can no longer be used
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.TimeoutError()
+    return await asyncio.wait_for(awaitable, deadline.remaining())
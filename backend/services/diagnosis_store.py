@@ -0,0 +1,138 @@
+"""
+Precomputed mistake diagnoses.
+
+`scripts/precompute_diagnoses.py` fills this store with a MistakeDiagnosis for
+every (passage, question, wrong option) in the question bank. Each row carries
+the fingerprint of the prompt it was generated from, so entries go stale on
+their own when the passage, options, template or model change.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from schemas import MistakeDiagnosis
+
+DIAGNOSIS_STORE_PATH = os.getenv(
+    "DIAGNOSIS_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "diagnoses.db")
+)
+
+DiagnosisKey = Tuple[str, int, str]  # (passage_id, question_id, wrong_option)
+
+
+class DiagnosisStore:
+    """
+    SQLite-backed store of precomputed diagnoses, readable by every worker.
+    """
+
+    def __init__(self, path: str = DIAGNOSIS_STORE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module never touches the disk
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS diagnoses ("
+                " passage_id TEXT NOT NULL,"
+                " question_id INTEGER NOT NULL,"
+                " wrong_option TEXT NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " trap_type TEXT NOT NULL,"
+                " hint_for_retry TEXT NOT NULL,"
+                " full_explanation TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (passage_id, question_id, wrong_option))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _lookup(self, key: DiagnosisKey, fingerprint: str) -> Tuple[Optional[MistakeDiagnosis], bool]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT fingerprint, trap_type, hint_for_retry, full_explanation FROM diagnoses"
+                " WHERE passage_id = ? AND question_id = ? AND wrong_option = ?",
+                key
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None, False
+        diagnosis = MistakeDiagnosis(trap_type=row[1], hint_for_retry=row[2], full_explanation=row[3])
+        if row[0] != fingerprint:
+            self.stale += 1
+            return diagnosis, False
+        self.hits += 1
+        return diagnosis, True
+
+    def _put(self, key: DiagnosisKey, fingerprint: str, diagnosis: MistakeDiagnosis):
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO diagnoses"
+                " (passage_id, question_id, wrong_option, fingerprint, trap_type, hint_for_retry, full_explanation, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, fingerprint, diagnosis.trap_type, diagnosis.hint_for_retry,
+                 diagnosis.full_explanation, time.time())
+            )
+
+    def fingerprints(self) -> Dict[DiagnosisKey, str]:
+        """
+        All stored keys with their fingerprints (used by the precompute job to skip fresh entries).
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT passage_id, question_id, wrong_option, fingerprint FROM diagnoses"
+            ).fetchall()
+        return {(r[0], r[1], r[2]): r[3] for r in rows}
+
+    def prune(self, keep: Set[DiagnosisKey]) -> int:
+        """
+        Delete entries for questions or options no longer in the bank. Returns rows removed.
+        """
+        stored = set(self.fingerprints())
+        gone = stored - keep
+        with self._lock:
+            self._connection().executemany(
+                "DELETE FROM diagnoses WHERE passage_id = ? AND question_id = ? AND wrong_option = ?",
+                list(gone)
+            )
+        return len(gone)
+
+    async def lookup(self, passage_id: str, question_id: int, wrong_option: str,
+                     fingerprint: str) -> Tuple[Optional[MistakeDiagnosis], bool]:
+        """
+        Return (diagnosis, fresh). `fresh` is False when the entry was generated
+        from an older prompt; such an entry is still usable as a fallback.
+        """
+        if not os.path.exists(self.path):
+            self.misses += 1
+            return None, False
+        return await asyncio.to_thread(self._lookup, (passage_id, question_id, wrong_option), fingerprint)
+
+    async def get(self, passage_id: str, question_id: int, wrong_option: str,
+                  fingerprint: str) -> Optional[MistakeDiagnosis]:
+        """
+        Return the stored diagnosis if it was generated from the same prompt, else None.
+        """
+        diagnosis, fresh = await self.lookup(passage_id, question_id, wrong_option, fingerprint)
+        return diagnosis if fresh else None
+
+    async def put(self, passage_id: str, question_id: int, wrong_option: str,
+                  fingerprint: str, diagnosis: MistakeDiagnosis):
+        await asyncio.to_thread(self._put, (passage_id, question_id, wrong_option), fingerprint, diagnosis)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+
+# Singleton instance
+diagnosis_store = DiagnosisStore()
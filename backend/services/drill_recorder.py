@@ -0,0 +1,243 @@
+"""
+Write-behind recorder for drill history (sessions, attempts, summaries).
+
+Request handlers only enqueue rows; a background task drains the queue and
+writes each batch with one multi-row INSERT per table, so the request path
+never waits on a Postgres round trip. Transient database errors are retried;
+if a row violates a constraint, the batch is rewritten table by table and
+then row by row, so only the offending rows are lost.
+"""
+
+import asyncio
+import datetime
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from database import AsyncSessionLocal
+from models import DrillSession, DrillAttempt, DrillSummary
+
+DRILL_RECORDER_BATCH_SIZE = int(os.getenv("DRILL_RECORDER_BATCH_SIZE", "500"))
+DRILL_RECORDER_FLUSH_SECONDS = float(os.getenv("DRILL_RECORDER_FLUSH_SECONDS", "0.5"))
+DRILL_RECORDER_MAX_QUEUE = int(os.getenv("DRILL_RECORDER_MAX_QUEUE", "20000"))
+# Attempts after a transient error (lost connection, lock or pool timeout), with exponential backoff
+DRILL_RECORDER_RETRIES = int(os.getenv("DRILL_RECORDER_RETRIES", "3"))
+DRILL_RECORDER_RETRY_BACKOFF_SECONDS = float(os.getenv("DRILL_RECORDER_RETRY_BACKOFF_SECONDS", "0.5"))
+
+# Parent rows first so foreign keys resolve within a batch
+_WRITE_ORDER = (DrillSession, DrillAttempt, DrillSummary)
+
+# Queued by stop() to tell the consumer to finish after draining
+_STOP = object()
+
+# Errors worth retrying as is; anything else will fail again the same way
+_TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+
+class DrillRecorder:
+    """
+    Buffers drill events in memory and flushes them to the database in batches.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal,
+                 batch_size: int = DRILL_RECORDER_BATCH_SIZE,
+                 flush_interval: float = DRILL_RECORDER_FLUSH_SECONDS,
+                 max_queue: int = DRILL_RECORDER_MAX_QUEUE,
+                 retries: int = DRILL_RECORDER_RETRIES,
+                 retry_backoff: float = DRILL_RECORDER_RETRY_BACKOFF_SECONDS):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue: "asyncio.Queue[Tuple[type, Dict]]" = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.lost = 0
+        self.retried = 0
+
+    # ------------------------------------------------------------------
+    # Producers (called from the request path; never block)
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, model, row: Dict):
+        row.setdefault("created_at", datetime.datetime.now(datetime.timezone.utc))
+        try:
+            self._queue.put_nowait((model, row))
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def record_session(self, session_id: str, user_id: Optional[int], difficulty: str,
+                       exam_date: str, passage_id: str, question_ids: List[int]):
+        self._enqueue(DrillSession, {
+            "id": session_id,
+            "user_id": user_id,
+            "difficulty": difficulty,
+            "exam_date": exam_date,
+            "passage_id": passage_id,
+            "question_ids": question_ids,
+        })
+
+    def record_attempt(self, session_id: str, question_id: int, selected_option: str,
+                       correct_option: str, trap_type: Optional[str] = None):
+        self._enqueue(DrillAttempt, {
+            "session_id": session_id,
+            "question_id": question_id,
+            "selected_option": selected_option,
+            "correct_option": correct_option,
+            "is_correct": selected_option == correct_option,
+            "trap_type": trap_type,
+        })
+
+    def record_summary(self, session_id: str, original_score: str, final_mastery: str,
+                       traps_identified: List[str], headline: Optional[str], body: Optional[str]):
+        self._enqueue(DrillSummary, {
+            "session_id": session_id,
+            "original_score": original_score,
+            "final_mastery": final_mastery,
+            "traps_identified": traps_identified,
+            "headline": headline,
+            "body": body,
+        })
+
+    # ------------------------------------------------------------------
+    # Consumer
+    # ------------------------------------------------------------------
+
+    async def _next_batch(self) -> Tuple[List[Tuple[type, Dict]], bool]:
+        """
+        Block for the first event, then gather more until the batch is full or
+        the flush window closes. Returns the batch and whether stop was requested.
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        item = await self._queue.get()
+        deadline = loop.time() + self.flush_interval
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return batch, item is _STOP
+
+    async def _insert(self, rows_by_model: Dict[type, List[Dict]]):
+        """
+        Insert the rows in one transaction, retrying transient errors with backoff.
+        Other errors (e.g. IntegrityError) are raised straight away.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session_factory() as db:
+                    for model in _WRITE_ORDER:
+                        rows = rows_by_model.get(model)
+                        if rows:
+                            await db.execute(insert(model).values(rows))
+                    await db.commit()
+                return
+            except _TRANSIENT_ERRORS:
+                if attempt >= self.retries:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    async def _insert_each(self, model, rows: List[Dict]) -> Tuple[int, Optional[Exception]]:
+        """
+        Insert rows one per transaction. Returns how many were written and the first error.
+        """
+        written, error = 0, None
+        for row in rows:
+            try:
+                await self._insert({model: [row]})
+                written += 1
+            except Exception as e:
+                error = error or e
+        return written, error
+
+    async def _write(self, batch: List[Tuple[type, Dict]]):
+        rows_by_model: Dict[type, List[Dict]] = {}
+        for model, row in batch:
+            rows_by_model.setdefault(model, []).append(row)
+
+        written, error = 0, None
+        try:
+            await self._insert(rows_by_model)
+            written = len(batch)
+        except IntegrityError:
+            # One bad row (say an attempt whose session row was dropped when the queue was full)
+            # fails the whole statement: write table by table, then row by row within a failing table
+            for model in _WRITE_ORDER:
+                rows = rows_by_model.get(model)
+                if not rows:
+                    continue
+                try:
+                    await self._insert({model: rows})
+                    written += len(rows)
+                except IntegrityError:
+                    count, row_error = await self._insert_each(model, rows)
+                    written += count
+                    error = error or row_error
+                except Exception as e:
+                    error = error or e
+        except Exception as e:
+            error = e
+
+        self.written += written
+        if written:
+            self.batches += 1
+        lost = len(batch) - written
+        if lost:
+            self.failed_batches += 1
+            self.lost += lost
+            # DBAPI errors carry the driver's one-line message in .orig
+            print(f"[DrillRecorder] Lost {lost}/{len(batch)} rows: {getattr(error, 'orig', None) or error}")
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background task and flush whatever is still queued.
+        """
+        if self._task is None:
+            return
+        # The sentinel sits behind every queued event, so they are all written first
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "lost": self.lost,
+            "retried": self.retried,
+        }
+
+
+# Singleton instance
+drill_recorder = DrillRecorder()
@@ -1,16 +1,28 @@
-# Please install OpenAI SDK first: `pip3 install openai`
+# Quick connectivity check against the configured LLM provider, using the app's shared client.
+# Usage (from backend/): python services/ds_demo.py
+import asyncio
 import os
-from openai import OpenAI
+import sys
 
-client = OpenAI(api_key="sk-2bf277804f9d4da39cf36d7b05d8dbac", base_url="https://api.deepseek.com")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-response = client.chat.completions.create(
-    model="deepseek-chat",
-    messages=[
-        {"role": "system", "content": "You are a helpful assistant"},
-        {"role": "user", "content": "Hello"},
-    ],
-    stream=False
-)
+from services.llm_client import llm_client
 
-print(response.choices[0].message.content)
\ No newline at end of file
+
+async def main():
+    try:
+        response = await llm_client.client.chat.completions.create(
+            model="deepseek-chat",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant"},
+                {"role": "user", "content": "Hello"},
+            ],
+            stream=False
+        )
+        print(response.choices[0].message.content)
+    finally:
+        await llm_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Hedged LLM requests.
+
+Recent latencies are tracked per prompt template. When a call is still running
+after the configured latency percentile (e.g. p95), an identical backup request
+is sent and whichever answers first wins; the other is cancelled. This trims
+the tail caused by the occasional slow upstream response at the cost of a few
+percent extra calls.
+
+Latencies are reported by the caller through observe(), timed around the
+upstream call only, so time spent queued in the scheduler does not inflate the
+hedge delay. No backup is sent while calls are queued for a scheduler slot: it
+would only wait behind them and take capacity from other requests.
+"""
+
+import asyncio
+import os
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from services.llm_scheduler import llm_scheduler
+
+T = TypeVar("T")
+
+# Hedge once a call runs longer than this percentile of recent latencies (0 disables hedging)
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Samples needed before hedging starts, and how many recent samples are kept
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies.
+    """
+
+    def __init__(self, window: int = LLM_HEDGE_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100.0))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Runs calls with a hedged backup request once they exceed the latency percentile.
+    """
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE,
+                 min_samples: int = LLM_HEDGE_MIN_SAMPLES, window: int = LLM_HEDGE_WINDOW,
+                 busy: Optional[Callable[[], bool]] = None):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        # Returns True while a backup request would only add to a backlog
+        self.busy = busy
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped_busy = 0
+
+    def _tracker(self, name: str) -> LatencyTracker:
+        tracker = self._trackers.get(name)
+        if tracker is None:
+            tracker = self._trackers[name] = LatencyTracker(self.window)
+        return tracker
+
+    def observe(self, name: str, seconds: float):
+        """
+        Record how long one successful upstream call for `name` took.
+        """
+        self._tracker(name).observe(seconds)
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """
+        Seconds to wait before sending a backup for `name`, or None while hedging
+        is disabled or there are too few samples.
+        """
+        tracker = self._tracker(name)
+        if self.percentile <= 0 or len(tracker) < self.min_samples:
+            return None
+        return tracker.percentile(self.percentile)
+
+    async def run(self, name: str, fn: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """
+        Return the result of `fn()`, racing a second `fn()` if the first is slow.
+        Pass hedge=False for work nobody is waiting on. Raises only if every attempt failed.
+        """
+        self.calls += 1
+        delay = self.hedge_delay(name) if hedge else None
+        if delay is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.busy is not None and self.busy():
+                    self.skipped_busy += 1
+                    return await primary
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(fn()))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Every attempt failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, object]:
+        result: Dict[str, object] = {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "skipped_busy": self.skipped_busy,
+        }
+        for name in sorted(self._trackers):
+            delay = self.hedge_delay(name)
+            result[f"hedge_delay_{name}"] = round(delay, 4) if delay is not None else None
+        return result
+
+
+# Singleton instance
+llm_hedger = Hedger(busy=lambda: bool(llm_scheduler.queued()))
@@ -0,0 +1,113 @@
+"""
+Incremental extraction of string fields from a JSON object that is still being streamed.
+
+The LLM streams its JSON answer a few characters at a time. PartialJsonFields
+consumes those chunks and reports, for the requested top-level keys, the new
+characters of their string values as soon as they arrive, so the client can
+render text before the object is complete.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class PartialJsonFields:
+    """
+    Streaming scanner for top-level string fields of a JSON object.
+
+        fields = PartialJsonFields(["headline", "body"])
+        for chunk in chunks:
+            for key, text in fields.feed(chunk):
+                ...  # text is the newly decoded part of that key's value
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = set(keys)
+        self.values: Dict[str, str] = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._string: List[str] = []
+        self._last_key: Optional[str] = None
+        self._expect_value = False
+        self._target: Optional[str] = None  # Key whose value string we are inside
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        deltas: Dict[str, List[str]] = {}
+        for ch in chunk:
+            if self._in_string:
+                decoded = self._consume_string_char(ch)
+                if decoded and self._target is not None:
+                    deltas.setdefault(self._target, []).append(decoded)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+                # A string right after "key": at the top level is that key's value
+                if self._expect_value and self._depth == 1 and self._last_key in self.keys:
+                    self._target = self._last_key
+                    self.values.setdefault(self._target, "")
+                else:
+                    self._target = None
+            elif ch == ":":
+                self._expect_value = True
+            elif ch in "{[":
+                self._depth += 1
+                self._expect_value = False
+            elif ch in "}]":
+                self._depth -= 1
+                self._expect_value = False
+            elif ch == ",":
+                self._expect_value = False
+                self._last_key = None
+
+        result = []
+        for key, parts in deltas.items():
+            text = "".join(parts)
+            self.values[key] += text
+            result.append((key, text))
+        return result
+
+    def _consume_string_char(self, ch: str) -> str:
+        """
+        Advance the string state by one raw character; returns the decoded text it produced.
+        """
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) < 4:
+                return ""
+            try:
+                decoded = chr(int(self._unicode, 16))
+            except ValueError:
+                decoded = ""
+            self._unicode = None
+            self._string.append(decoded)
+            return decoded
+
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+                return ""
+            decoded = _ESCAPES.get(ch, ch)
+            self._string.append(decoded)
+            return decoded
+
+        if ch == "\\":
+            self._escape = True
+            return ""
+
+        if ch == '"':
+            self._in_string = False
+            if self._target is None and not self._expect_value:
+                self._last_key = "".join(self._string)
+            else:
+                self._expect_value = False
+            self._target = None
+            return ""
+
+        self._string.append(ch)
+        return ch
@@ -0,0 +1,216 @@
+"""
+Content-addressed cache for LLM results.
+
+Entries are keyed by a hash of the provider, the model name and the fully
+rendered prompt, so any change to the passage, question, options or template
+produces a new key, and mock answers never mix with real ones.
+Lookups go to an in-memory LRU first and then to an on-disk tier that survives
+restarts and is shared by every worker on the host. The disk tier is swept at
+startup and again after every few writes: expired entries go first, then the
+oldest ones beyond the size bound.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+DIAGNOSIS_CACHE_DIR = os.getenv(
+    "DIAGNOSIS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "diagnoses")
+)
+DIAGNOSIS_CACHE_MAX_ENTRIES = int(os.getenv("DIAGNOSIS_CACHE_MAX_ENTRIES", "5000"))
+DIAGNOSIS_CACHE_TTL_SECONDS = float(os.getenv("DIAGNOSIS_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+# Files kept in the disk tier (0 = unbounded); it may overshoot by a tenth between sweeps
+DIAGNOSIS_CACHE_MAX_DISK_ENTRIES = int(os.getenv("DIAGNOSIS_CACHE_MAX_DISK_ENTRIES", "50000"))
+
+# Temp files older than this are left over from a crashed write
+_STALE_TMP_SECONDS = 3600
+
+
+def cache_key(model: str, *prompt_parts: str) -> str:
+    """
+    Hash the model name and prompt parts into a cache key.
+    """
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for part in prompt_parts:
+        digest.update(b"\0")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + disk) cache of JSON-serializable LLM results.
+
+    Set `directory` to an empty string to keep the cache in memory only,
+    `ttl_seconds` to 0 to keep entries until they are evicted, and
+    `max_disk_entries` to 0 to never trim the disk tier by size.
+    """
+
+    def __init__(self, directory: str = DIAGNOSIS_CACHE_DIR,
+                 max_entries: int = DIAGNOSIS_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = DIAGNOSIS_CACHE_TTL_SECONDS,
+                 max_disk_entries: int = DIAGNOSIS_CACHE_MAX_DISK_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._writes_since_sweep = 0
+        self._sweeping = False
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.writes = 0
+        self.swept = 0
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def _path(self, key: str) -> str:
+        # Shard by prefix so no single directory grows unbounded
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, stored_at: float, value: Dict):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, Dict]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record["stored_at"], record["value"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, stored_at: float, value: Dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name: several threads and workers may write the same key at once
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(path),
+                                         prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            try:
+                json.dump({"stored_at": stored_at, "value": value}, f)
+            except BaseException:
+                f.close()
+                os.unlink(tmp_path)
+                raise
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def _sweep_disk(self) -> int:
+        """
+        Delete expired entries, stale temp files and then the oldest entries
+        beyond max_disk_entries. File mtimes stand in for stored_at. Returns
+        how many entries were removed.
+        """
+        now = time.time()
+        entries: List[Tuple[float, str]] = []
+        removed = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for item in os.scandir(shard.path):
+                try:
+                    mtime = item.stat().st_mtime
+                    if item.name.endswith(".tmp"):
+                        if now - mtime > _STALE_TMP_SECONDS:
+                            os.unlink(item.path)
+                    elif self._expired(mtime):
+                        os.unlink(item.path)
+                        removed += 1
+                    else:
+                        entries.append((mtime, item.path))
+                except FileNotFoundError:
+                    # Replaced or removed by another worker meanwhile
+                    continue
+        if 0 < self.max_disk_entries < len(entries):
+            entries.sort()
+            for _, path in entries[:len(entries) - self.max_disk_entries]:
+                try:
+                    os.unlink(path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    async def sweep(self):
+        """
+        Trim the disk tier in a worker thread. Failures are logged, not raised.
+        """
+        self._writes_since_sweep = 0
+        if not self.directory or self._sweeping or not os.path.isdir(self.directory):
+            return
+        self._sweeping = True
+        try:
+            self.swept += await asyncio.to_thread(self._sweep_disk)
+        except OSError as e:
+            print(f"[ResponseCache] Sweep of {self.directory} failed: {e}")
+        finally:
+            self._sweeping = False
+
+    async def get(self, key: str) -> Optional[Dict]:
+        item = self._memory.get(key)
+        if item is not None:
+            if not self._expired(item[0]):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return item[1]
+            del self._memory[key]
+            self.expired += 1
+
+        if self.directory:
+            item = await asyncio.to_thread(self._read_disk, key)
+            if item is not None:
+                if not self._expired(item[0]):
+                    self._remember(key, *item)
+                    self.disk_hits += 1
+                    return item[1]
+                self.expired += 1
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: Dict):
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+        self.writes += 1
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write_disk, key, stored_at, value)
+            except OSError as e:
+                print(f"[ResponseCache] Failed to write {key}: {e}")
+            self._writes_since_sweep += 1
+            if self.max_disk_entries > 0 and self._writes_since_sweep >= max(1, self.max_disk_entries // 10):
+                # In the background: the caller should not wait for a directory walk
+                self._sweep_task = asyncio.ensure_future(self.sweep())
+
+    def stats(self) -> Dict[str, int]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "writes": self.writes,
+            "swept": self.swept,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Singleton instance
+diagnosis_cache = ResponseCache()
@@ -0,0 +1,136 @@
+"""
+Shared HTTP client for the LLM provider.
+
+One AsyncOpenAI client backed by a tuned httpx connection pool is kept for the
+life of the process. Connections stay alive between calls, so analyze and
+summary requests reuse warm TLS connections instead of paying a handshake on
+every burst. The FastAPI lifespan starts it (optionally pre-opening connections)
+and closes it on shutdown.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+# Required for the real provider: the app refuses to start without it (use LLM_PROVIDER=mock offline)
+LLM_API_KEY = os.getenv("LLM_API_KEY", "")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.deepseek.com")
+
+# Connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "16"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# Timeouts (read covers the gap between streamed chunks, not the whole completion)
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "60"))
+LLM_WRITE_TIMEOUT_SECONDS = float(os.getenv("LLM_WRITE_TIMEOUT_SECONDS", "10"))
+LLM_POOL_TIMEOUT_SECONDS = float(os.getenv("LLM_POOL_TIMEOUT_SECONDS", "10"))
+
+# HTTP/2 multiplexes concurrent calls over one connection; needs the optional `h2` package
+# (pip install "httpx[http2]"), so it is off unless enabled
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Connections opened at startup so the first requests skip the TLS handshake (0 disables)
+LLM_WARMUP_CONNECTIONS = int(os.getenv("LLM_WARMUP_CONNECTIONS", "0"))
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LLMClientManager:
+    """
+    Owns the process-wide AsyncOpenAI client and its httpx connection pool.
+
+    The client is created on first use, so scripts work without the app's
+    lifespan; call close() when done to release the connections.
+    """
+
+    def __init__(self, api_key: str = LLM_API_KEY, base_url: str = LLM_BASE_URL,
+                 http2: bool = LLM_HTTP2):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.http2 = http2 and _h2_available()
+        self._http2_requested = http2
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncOpenAI] = None
+
+    def check(self):
+        """
+        Raise if the client cannot work, so a misconfigured deployment fails at startup.
+        """
+        if not self.api_key:
+            raise RuntimeError("LLM_API_KEY is not set; set it, or use LLM_PROVIDER=mock to run offline")
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self.check()
+            if self._http2_requested and not self.http2:
+                print("[LLMClient] h2 not installed, using HTTP/1.1")
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS
+                ),
+                timeout=httpx.Timeout(
+                    connect=LLM_CONNECT_TIMEOUT_SECONDS,
+                    read=LLM_READ_TIMEOUT_SECONDS,
+                    write=LLM_WRITE_TIMEOUT_SECONDS,
+                    pool=LLM_POOL_TIMEOUT_SECONDS
+                )
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self._http_client,
+                max_retries=LLM_MAX_RETRIES
+            )
+        return self._client
+
+    async def start(self, warmup_connections: int = LLM_WARMUP_CONNECTIONS):
+        """
+        Create the client and optionally pre-open connections to the provider.
+        Raises if LLM_API_KEY is missing; warm-up failures are logged and ignored.
+        """
+        client = self.client
+        if warmup_connections <= 0:
+            return
+
+        async def touch():
+            # Listing models is free and completes a full TLS handshake
+            await client.models.list()
+
+        results = await asyncio.gather(*(touch() for _ in range(warmup_connections)), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            print(f"[LLMClient] Warm-up: {len(failed)}/{warmup_connections} connections failed: {failed[0]}")
+
+    async def close(self):
+        if self._client is None:
+            return
+        client, self._client, self._http_client = self._client, None, None
+        await client.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "open": self._client is not None,
+            "http2": self.http2,
+            "max_connections": LLM_MAX_CONNECTIONS,
+            "max_keepalive_connections": LLM_MAX_KEEPALIVE_CONNECTIONS,
+        }
+
+
+# Singleton instance
+llm_client = LLMClientManager()
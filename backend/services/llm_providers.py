@@ -0,0 +1,341 @@
+"""
+LLM provider abstraction.
+
+llm_service talks to a provider instead of the OpenAI SDK directly. Two are
+available, selected with LLM_PROVIDER:
+
+- "openai" (default): the real provider through the shared pooled client
+  (services/llm_client.py), for DeepSeek or any OpenAI-compatible API.
+- "mock": a deterministic in-process stand-in with configurable latency
+  distributions, error injection, streaming and simulated prefix caching, so
+  the backend can be load-tested and benchmarked offline.
+  scripts/mock_llm_server.py serves the same mock over an OpenAI-compatible
+  HTTP API for testing the real client path end to end.
+
+Both return OpenAI SDK response objects (ChatCompletion, or an async iterator
+of ChatCompletionChunk when streaming), so callers do not care which is used.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import httpx
+from openai import InternalServerError, RateLimitError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from services.llm_client import llm_client
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+
+# Mock latency: distribution of the time to the first token
+MOCK_LLM_LATENCY_DISTRIBUTION = os.getenv("MOCK_LLM_LATENCY_DISTRIBUTION", "lognormal")  # fixed|uniform|normal|lognormal
+MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "800"))      # Median (lognormal) or mean
+MOCK_LLM_LATENCY_JITTER = float(os.getenv("MOCK_LLM_LATENCY_JITTER", "0.4"))  # Sigma (lognormal) or relative spread
+# Generation speed after the first token
+MOCK_LLM_TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "60"))
+# Error injection (fractions of calls)
+MOCK_LLM_ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))            # HTTP 500
+MOCK_LLM_RATE_LIMIT_RATE = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))  # HTTP 429
+MOCK_LLM_HANG_RATE = float(os.getenv("MOCK_LLM_HANG_RATE", "0"))              # Never answers within MOCK_LLM_HANG_SECONDS
+MOCK_LLM_HANG_SECONDS = float(os.getenv("MOCK_LLM_HANG_SECONDS", "120"))
+MOCK_LLM_SEED = os.getenv("MOCK_LLM_SEED", "0")
+
+# Prefix caching is simulated in blocks of this many characters (about 64 tokens)
+_CACHE_BLOCK_CHARS = 256
+_MOCK_TRAPS = ("Out of Scope", "Extreme Language", "Distortion", "Correlation vs. Causation", "Reverse Causality")
+_QUESTION_ID = re.compile(r"question_id:\s*(\d+)")
+
+
+class LLMProvider(ABC):
+    """
+    Something that can answer OpenAI-style chat completion requests.
+    """
+
+    name = "base"
+
+    @property
+    def cache_scope(self) -> str:
+        """
+        Identifies where answers come from; part of the diagnosis cache key, so
+        answers from one provider are never served as another's.
+        """
+        return self.name
+
+    def check(self):
+        """
+        Raise if the provider is not configured well enough to answer.
+        """
+
+    @abstractmethod
+    async def chat_completion(self, *, model: str, messages: List[Dict[str, str]], stream: bool = False,
+                              **kwargs):
+        """
+        Same contract as AsyncOpenAI().chat.completions.create.
+        """
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, object]:
+        return {"provider": self.name}
+
+
+class OpenAIProvider(LLMProvider):
+    """
+    The real provider, through the process-wide pooled AsyncOpenAI client.
+    """
+
+    name = "openai"
+
+    @property
+    def cache_scope(self) -> str:
+        # The same client pointed at another endpoint (e.g. scripts/mock_llm_server.py) gives other answers
+        return f"{self.name}@{llm_client.base_url}"
+
+    async def chat_completion(self, *, model: str, messages: List[Dict[str, str]], stream: bool = False,
+                              **kwargs):
+        return await llm_client.client.chat.completions.create(
+            model=model, messages=messages, stream=stream, **kwargs
+        )
+
+    def check(self):
+        llm_client.check()
+
+    async def start(self):
+        await llm_client.start()
+
+    async def close(self):
+        await llm_client.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {"provider": self.name, **llm_client.stats()}
+
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic offline provider. Answers are valid JSON for the app's prompts
+    (single diagnosis, batched diagnoses, coach summary); latency and injected
+    failures are drawn from a RNG seeded by the prompt and how often it was seen,
+    so repeated runs replay the same timings.
+    """
+
+    name = "mock"
+
+    def __init__(self, distribution: str = MOCK_LLM_LATENCY_DISTRIBUTION,
+                 latency_ms: float = MOCK_LLM_LATENCY_MS, jitter: float = MOCK_LLM_LATENCY_JITTER,
+                 tokens_per_second: float = MOCK_LLM_TOKENS_PER_SECOND,
+                 error_rate: float = MOCK_LLM_ERROR_RATE, rate_limit_rate: float = MOCK_LLM_RATE_LIMIT_RATE,
+                 hang_rate: float = MOCK_LLM_HANG_RATE, hang_seconds: float = MOCK_LLM_HANG_SECONDS,
+                 seed: str = MOCK_LLM_SEED):
+        if distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.seed = seed
+        self._seen_prompts: Dict[str, int] = {}
+        self._cached_blocks: Set[str] = set()
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.hangs = 0
+
+    # ---- randomness -------------------------------------------------------
+
+    def _rng(self, prompt_hash: str) -> random.Random:
+        count = self._seen_prompts.get(prompt_hash, 0)
+        if len(self._seen_prompts) > 100_000:
+            self._seen_prompts.clear()
+        self._seen_prompts[prompt_hash] = count + 1
+        return random.Random(f"{self.seed}:{prompt_hash}:{count}")
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """
+        Seconds until the first token.
+        """
+        base = self.latency_ms / 1000.0
+        if self.distribution == "fixed":
+            return base
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(base * (1 - self.jitter), base * (1 + self.jitter)))
+        if self.distribution == "normal":
+            return max(0.0, rng.gauss(base, base * self.jitter))
+        return base * math.exp(rng.gauss(0.0, self.jitter))
+
+    # ---- simulated provider behaviour -------------------------------------
+
+    def _cached_prefix_tokens(self, text: str) -> int:
+        """
+        Count leading blocks of `text` seen in earlier prompts, then remember this prompt's blocks.
+        """
+        digest = hashlib.sha256()
+        cached_blocks = 0
+        still_cached = True
+        for start in range(0, len(text) - _CACHE_BLOCK_CHARS + 1, _CACHE_BLOCK_CHARS):
+            digest.update(text[start:start + _CACHE_BLOCK_CHARS].encode("utf-8"))
+            block = digest.hexdigest()
+            if still_cached and block in self._cached_blocks:
+                cached_blocks += 1
+            else:
+                still_cached = False
+                self._cached_blocks.add(block)
+        if len(self._cached_blocks) > 100_000:
+            self._cached_blocks.clear()
+        return cached_blocks * _CACHE_BLOCK_CHARS // 4
+
+    def _content(self, prompt: str, rng: random.Random) -> str:
+        question_ids = _QUESTION_ID.findall(prompt)
+        if question_ids:
+            return json.dumps({"diagnoses": [self._diagnosis(rng, int(q)) for q in question_ids]})
+        if '"headline"' in prompt:
+            headline = rng.choice(("Sloppy but Saved", "Ice Cold Logic", "Tighten Up", "Back in the Pocket"))
+            return json.dumps({
+                "headline": headline,
+                "body": "You took the bait on the extreme wording twice. Slow down on qualifiers, "
+                        "prove every claim from the text, and this score climbs before exam day."
+            })
+        return json.dumps(self._diagnosis(rng))
+
+    def _diagnosis(self, rng: random.Random, question_id: Optional[int] = None) -> Dict:
+        trap = rng.choice(_MOCK_TRAPS)
+        diagnosis = {
+            "trap_type": trap,
+            "hint_for_retry": f"Next time, check the choice against the exact lines before you commit ({trap}).",
+            "full_explanation": (
+                f"I see why this choice appealed to you, but it is a classic {trap} trap. "
+                "Where in the passage does the author actually say that? Go back to the lines you relied on "
+                "and compare them word by word with the option. Next time, prove the answer from the text first."
+            )
+        }
+        if question_id is not None:
+            diagnosis = {"question_id": question_id, **diagnosis}
+        return diagnosis
+
+    def _usage(self, prompt_text: str, content: str) -> Dict:
+        prompt_tokens = len(prompt_text) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        cached = min(self._cached_prefix_tokens(prompt_text), prompt_tokens)
+        # DeepSeek-style cache fields, which prompt_registry.record_usage understands
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": cached,
+            "prompt_cache_miss_tokens": prompt_tokens - cached,
+        }
+
+    def _fail(self, status: int, message: str):
+        response = httpx.Response(status, request=httpx.Request("POST", "http://mock-llm/chat/completions"))
+        error = RateLimitError if status == 429 else InternalServerError
+        raise error(message, response=response, body={"error": {"message": message}})
+
+    async def chat_completion(self, *, model: str, messages: List[Dict[str, str]], stream: bool = False,
+                              **kwargs):
+        self.calls += 1
+        prompt_text = "\n".join(m.get("content", "") for m in messages)
+        rng = self._rng(hashlib.sha256(prompt_text.encode("utf-8")).hexdigest())
+        latency = self.sample_latency(rng)
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            await asyncio.sleep(min(latency, 0.05))
+            self._fail(429, "Mock rate limit")
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(latency)
+            self._fail(500, "Mock upstream error")
+        roll -= self.error_rate
+        if roll < self.hang_rate:
+            self.hangs += 1
+            await asyncio.sleep(self.hang_seconds)
+            self._fail(500, "Mock upstream hung")
+
+        content = self._content(messages[-1].get("content", ""), rng)
+        usage = self._usage(prompt_text, content)
+        completion_id = f"mock-{self.calls}"
+        created = int(time.time())
+
+        if not stream:
+            await asyncio.sleep(latency + usage["completion_tokens"] / self.tokens_per_second)
+            return ChatCompletion.model_validate({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }],
+                "usage": usage,
+            })
+
+        await asyncio.sleep(latency)
+        include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+        return self._stream(completion_id, created, model, content, usage if include_usage else None)
+
+    async def _stream(self, completion_id: str, created: int, model: str, content: str,
+                      usage: Optional[Dict]) -> AsyncIterator[ChatCompletionChunk]:
+        def chunk(delta: Dict, finish_reason: Optional[str] = None, chunk_usage: Optional[Dict] = None):
+            return ChatCompletionChunk.model_validate({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if chunk_usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": chunk_usage,
+            })
+
+        # About one token (4 characters) per chunk
+        step = 4
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        yield chunk({"role": "assistant", "content": ""})
+        for start in range(0, len(content), step):
+            await asyncio.sleep(delay)
+            yield chunk({"content": content[start:start + step]})
+        yield chunk({}, finish_reason="stop")
+        if usage is not None:
+            yield chunk({}, chunk_usage=usage)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "provider": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "hangs": self.hangs,
+        }
+
+
+def create_llm_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    """
+    Build the provider selected by LLM_PROVIDER ("openai" or "mock").
+    The mock is only ever used when selected explicitly.
+    """
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "mock":
+        return MockProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
+
+
+# Singleton instance
+llm_provider = create_llm_provider()
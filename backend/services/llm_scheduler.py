@@ -0,0 +1,216 @@
+"""
+Process-wide scheduler for outgoing LLM calls.
+
+Every upstream request takes a slot from the scheduler first. Slots are handed
+out in priority order, and only while the concurrency cap, the requests-per-second
+bucket and the tokens-per-minute bucket all allow it. Excess work queues instead
+of hitting the provider and coming back as 429s.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0  # Diagnoses a student is waiting on
+PRIORITY_SUMMARY = 1      # End-of-session coach message
+PRIORITY_BATCH = 2        # Offline jobs (precompute, evaluation)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "10"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Classic token bucket. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` tokens are available (0 if they are available now).
+        """
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.enabled:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        # Correct an estimate once the real usage is known; may go negative to delay later calls
+        if self.enabled:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class Reservation:
+    """
+    Handle for a granted slot; lets the caller report the real token usage.
+    """
+
+    def __init__(self, scheduler: "LLMScheduler", estimated_tokens: int):
+        self._scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, actual_tokens: Optional[int]):
+        if actual_tokens is not None:
+            self._scheduler.token_bucket.adjust(actual_tokens - self.estimated_tokens)
+            self._scheduler.tokens_used += actual_tokens
+
+
+class LLMScheduler:
+    """
+    Priority queue in front of the LLM provider with concurrency and rate limits.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 requests_per_second: float = LLM_REQUESTS_PER_SECOND,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        # Allow bursts of up to one second's worth of requests
+        self.request_bucket = TokenBucket(requests_per_second, max(requests_per_second, 1.0))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.rate_limited = 0
+        self.tokens_used = 0
+        self.total_wait_seconds = 0.0
+
+    def _schedule_retry(self, delay: float):
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            if self._timer.when() <= loop.time() + delay:
+                return
+            self._timer.cancel()
+
+        def fire():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = loop.call_later(delay, fire)
+
+    def _dispatch(self):
+        """
+        Grant slots to the highest-priority waiters while every limit allows it.
+        """
+        while self._waiters and self._active < self.max_concurrency:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():  # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self.request_bucket.wait_time(1, now),
+                self.token_bucket.wait_time(tokens, now),
+            )
+            if wait > 0:
+                self._schedule_retry(wait)
+                return
+
+            heapq.heappop(self._waiters)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self._active += 1
+            self.granted += 1
+            future.set_result(None)
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, estimated_tokens: int = 0):
+        """
+        Wait for permission to make one upstream call.
+
+            async with llm_scheduler.slot(PRIORITY_INTERACTIVE, tokens) as reservation:
+                response = await client.chat.completions.create(...)
+                reservation.settle(response.usage.total_tokens)
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), estimated_tokens, future))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted and cancelled in the same tick: give the slot back
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        self.total_wait_seconds += time.monotonic() - started
+
+        try:
+            yield Reservation(self, estimated_tokens)
+        finally:
+            self._release()
+
+    def backoff(self, seconds: float):
+        """
+        Pause all grants, e.g. after the provider answered 429.
+        """
+        self.rate_limited += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def queued(self) -> Dict[int, int]:
+        """
+        Number of calls still waiting for a slot, per priority.
+        """
+        queued: Dict[int, int] = {}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                queued[priority] = queued.get(priority, 0) + 1
+        return queued
+
+    def stats(self) -> Dict[str, float]:
+        queued = self.queued()
+        return {
+            "active": self._active,
+            "queued_interactive": queued.get(PRIORITY_INTERACTIVE, 0),
+            "queued_summary": queued.get(PRIORITY_SUMMARY, 0),
+            "queued_batch": queued.get(PRIORITY_BATCH, 0),
+            "granted": self.granted,
+            "rate_limited": self.rate_limited,
+            "tokens_used": self.tokens_used,
+            "avg_wait_seconds": round(self.total_wait_seconds / self.granted, 4) if self.granted else 0.0,
+        }
+
+
+# Singleton instance
+llm_scheduler = LLMScheduler()
@@ -1,86 +1,362 @@
+import asyncio
 import json
-from typing import Tuple, List, Dict
-from pathlib import Path
-from openai import AsyncOpenAI
+import os
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Tuple, List, Dict, Optional, Union
+from openai import RateLimitError
 from schemas import (
     Passage,
     Question,
     MistakeDiagnosis,
     CoachMessage
 )
+from services.llm_cache import diagnosis_cache, cache_key
+from services.llm_providers import llm_provider
+from services.singleflight import SingleFlight
+from services.hedging import llm_hedger
+from services.deadline import Deadline, within
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.trap_classifier import trap_classifier
+from services.json_stream import PartialJsonFields
+from services.prompt_registry import prompt_registry
+from services.metrics import metrics, LLM_LATENCY_BUCKETS
+from services.llm_scheduler import (
+    llm_scheduler,
+    estimate_tokens,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_SUMMARY,
+    PRIORITY_BATCH
+)
+
+MODEL = "deepseek-chat"
+ANALYZE_SYSTEM_PROMPT = "You are a GRE tutor. Output valid JSON only."
+SUMMARY_SYSTEM_PROMPT = "You are a tough GRE drill sergeant. Output valid JSON only."
+
+# Concurrent identical prompts share one upstream call (keyed like the cache)
+llm_singleflight = SingleFlight()
+
+# Fails calls fast while the provider is down; 429s are the scheduler's business, not a health signal
+llm_breaker = CircuitBreaker(ignored=(RateLimitError,))
 
-# Initialize DeepSeek Client (using your provided key and endpoint)
-client = AsyncOpenAI(
-    api_key="sk-2bf277804f9d4da39cf36d7b05d8dbac", 
-    base_url="https://api.deepseek.com"
+# Expected completion size, used to reserve tokens-per-minute budget up front
+EXPECTED_OUTPUT_TOKENS = 400
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+LLM_RATE_LIMIT_BACKOFF_SECONDS = float(os.getenv("LLM_RATE_LIMIT_BACKOFF_SECONDS", "2.0"))
+
+# Provider call latency (time queued in the scheduler excluded) and token usage, per prompt template
+llm_call_seconds = metrics.histogram(
+    "llm_call_duration_seconds", "LLM provider call latency by prompt template", ("template", "outcome"),
+    LLM_LATENCY_BUCKETS
 )
+llm_tokens = metrics.counter("llm_tokens_total", "LLM tokens used by prompt template", ("template", "kind"))
 
-async def analyze_mistake(
-    passage: Passage, 
-    question: Question, 
-    user_wrong_answer: str, 
+
+@contextmanager
+def _timed_call(template: str):
+    """
+    Observes one provider call. The outcome is ok, rate_limited, cancelled (e.g. the losing side of a hedge) or error.
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except RateLimitError:
+        outcome = "rate_limited"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        llm_call_seconds.observe(time.perf_counter() - started, template=template, outcome=outcome)
+
+
+def _record_usage(template: str, usage):
+    cached = prompt_registry.record_usage(template, usage)
+    if usage is None:
+        return
+    llm_tokens.inc(getattr(usage, "prompt_tokens", None) or 0, template=template, kind="prompt")
+    llm_tokens.inc(getattr(usage, "completion_tokens", None) or 0, template=template, kind="completion")
+    llm_tokens.inc(cached or 0, template=template, kind="cached")
+
+
+async def _chat_json(system_prompt: str, prompt: str, priority: int, template: str,
+                     output_tokens: int = EXPECTED_OUTPUT_TOKENS) -> dict:
+    """
+    Sends one JSON-mode chat completion through the scheduler and returns the parsed object.
+    On a 429 the whole scheduler backs off and the call is re-queued.
+    Raises CircuitOpenError straight away while the circuit breaker is open.
+    `template` names the prompt template, for per-template prefix-cache stats.
+    """
+    estimated = estimate_tokens(system_prompt, prompt) + output_tokens
+    attempt = 0
+    while True:
+        llm_breaker.check()
+        async with llm_scheduler.slot(priority, estimated) as reservation:
+            started = time.perf_counter()
+            try:
+                with _timed_call(template):
+                    async with llm_breaker.guard():
+                        response = await llm_provider.chat_completion(
+                            model=MODEL,
+                            messages=[
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": prompt}
+                            ],
+                            stream=False,
+                            response_format={"type": "json_object"}
+                        )
+            except RateLimitError:
+                llm_scheduler.backoff(LLM_RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt))
+                if attempt >= LLM_RATE_LIMIT_RETRIES:
+                    raise
+                attempt += 1
+                continue
+            # Only the time holding the slot: queueing in the scheduler is not upstream latency
+            llm_hedger.observe(template, time.perf_counter() - started)
+            usage = getattr(response, "usage", None)
+            reservation.settle(getattr(usage, "total_tokens", None))
+            _record_usage(template, usage)
+
+        return json.loads(response.choices[0].message.content)
+
+def render_mistake_prompt(
+    passage: Passage,
+    question: Question,
+    user_wrong_answer: str,
     correct_answer: str
-) -> MistakeDiagnosis:
+) -> str:
     """
-    Analyzes why the user might have chosen the wrong answer.
+    Renders the mistake analysis prompt from the preloaded template. Raises if it cannot be rendered.
     """
-    
     # Resolve option text from keys (e.g., "A" -> "The author implies...")
     # user_wrong_answer and correct_answer might be keys (A, B) or values.
     # The dictionary lookups handle keys. If they are already values or keys not in dict, use as is.
     user_wrong_answer_text = question.options.get(user_wrong_answer, user_wrong_answer)
     correct_answer_text = question.options.get(correct_answer, correct_answer)
 
-    # Load prompt template
-    try:
-        # Resolves to backend/prompts/mistake_analyse.txt
-        prompt_path = Path(__file__).parent.parent / "prompts" / "mistake_analyse.txt"
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-            
-        prompt = prompt_template.format(
-            name="Student",
-            passage=passage.text,
-            question=question.text,
-            picked_wrong_answer_text=user_wrong_answer_text,
-            correct_answer_text=correct_answer_text
+    return prompt_registry.render(
+        "mistake_analyse",
+        name="Student",
+        passage=passage.text,
+        question=question.text,
+        picked_wrong_answer_text=user_wrong_answer_text,
+        correct_answer_text=correct_answer_text
+    )
+
+
+def diagnosis_fingerprint(prompt: str) -> str:
+    """
+    Content hash identifying a diagnosis: changes whenever the provider, the model or any prompt input changes.
+    """
+    return cache_key(MODEL, llm_provider.cache_scope, ANALYZE_SYSTEM_PROMPT, prompt)
+
+
+def _diagnosis_from(data: dict) -> MistakeDiagnosis:
+    return MistakeDiagnosis(
+        trap_type=data.get("trap_type", "Unknown"),
+        hint_for_retry=data.get("hint_for_retry", "Review the passage carefully."),
+        full_explanation=data.get("full_explanation", "No explanation provided.")
+    )
+
+
+async def request_diagnosis(prompt: str, priority: int = PRIORITY_INTERACTIVE,
+                            use_cache: bool = True) -> MistakeDiagnosis:
+    """
+    Returns the diagnosis for a rendered prompt, from cache or the LLM.
+    With use_cache=False the cache is not read, but the fresh answer still replaces the cached one.
+    Raises on LLM or parsing errors (nothing is cached in that case).
+    """
+    # Identical passage/question/options render the identical prompt, so reuse earlier diagnoses
+    key = diagnosis_fingerprint(prompt)
+    if use_cache:
+        cached = await diagnosis_cache.get(key)
+        if cached is not None:
+            return MistakeDiagnosis(**cached)
+
+    async def fetch() -> MistakeDiagnosis:
+        # Slow upstream calls get a hedged duplicate; the first answer wins (not worth it for offline batches)
+        data = await llm_hedger.run(
+            "mistake_analyse",
+            lambda: _chat_json(ANALYZE_SYSTEM_PROMPT, prompt, priority, "mistake_analyse"),
+            hedge=priority != PRIORITY_BATCH
         )
+        diagnosis = _diagnosis_from(data)
+        await diagnosis_cache.put(key, diagnosis.model_dump())
+        return diagnosis
+
+    return await llm_singleflight.do(key, fetch)
+
+
+async def analyze_mistake(
+    passage: Passage, 
+    question: Question, 
+    user_wrong_answer: str, 
+    correct_answer: str,
+    deadline: Optional[Deadline] = None,
+    fallback: Optional[MistakeDiagnosis] = None
+) -> MistakeDiagnosis:
+    """
+    Analyzes why the user might have chosen the wrong answer.
+
+    Gives up when `deadline` passes (the upstream call keeps running and fills
+    the cache for next time). On a missed deadline, an open circuit or an LLM
+    error the cached diagnosis is served if one has landed, else `fallback`
+    (e.g. an older precomputed diagnosis), else a local keyword-based diagnosis.
+    """
+    
+    # Render prompt template
+    try:
+        prompt = render_mistake_prompt(passage, question, user_wrong_answer, correct_answer)
     except Exception as e:
         print(f"Error preparing prompt: {e}")
-        return MistakeDiagnosis(
-            trap_type="System Error",
-            hint_for_retry="Could not generate analysis.",
-            full_explanation="Error loading analysis prompt."
-        )
+        return fallback or trap_classifier.diagnose(passage, question, user_wrong_answer)
     
     try:
-        response = await client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a GRE tutor. Output valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            stream=False,
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        
-        return MistakeDiagnosis(
-            trap_type=data.get("trap_type", "Unknown"),
-            hint_for_retry=data.get("hint_for_retry", "Review the passage carefully."),
-            full_explanation=data.get("full_explanation", "No explanation provided.")
-        )
-        
+        return await within(deadline, request_diagnosis(prompt))
+    except asyncio.TimeoutError:
+        print(f"Diagnosis for question {question.id} missed its deadline, serving fallback")
+        cached = await diagnosis_cache.get(diagnosis_fingerprint(prompt))
+        if cached is not None:
+            return MistakeDiagnosis(**cached)
+    except CircuitOpenError:
+        pass
     except Exception as e:
         print(f"LLM Error in analyze: {e}")
-        return MistakeDiagnosis(
-            trap_type="Unknown",
-            hint_for_retry="Check the text again.",
-            full_explanation="Error generating explanation."
+    return fallback or trap_classifier.diagnose(passage, question, user_wrong_answer)
+
+def render_batch_mistake_prompt(
+    passage: Passage,
+    mistakes: List[Tuple[Question, str, str]]
+) -> str:
+    """
+    Renders one prompt covering several (question, wrong answer, correct answer) mistakes
+    on the same passage, so the passage is only sent once.
+    """
+    blocks = []
+    for question, user_wrong_answer, correct_answer in mistakes:
+        blocks.append(
+            f"## question_id: {question.id}\n"
+            f"Question: \"{question.text}\"\n"
+            f"User's Wrong Choice: \"{question.options.get(user_wrong_answer, user_wrong_answer)}\"\n"
+            f"Actual Correct Answer (HIDDEN FROM USER): \"{question.options.get(correct_answer, correct_answer)}\""
         )
 
+    return prompt_registry.render(
+        "batch_mistake_analyse",
+        name="Student",
+        passage=passage.text,
+        mistakes="\n\n".join(blocks)
+    )
+
+
+async def analyze_mistakes_batch(
+    passage: Passage,
+    mistakes: List[Tuple[Question, str, str]],
+    deadline: Optional[Deadline] = None,
+    fallbacks: Optional[List[Optional[MistakeDiagnosis]]] = None
+) -> List[MistakeDiagnosis]:
+    """
+    Diagnoses several mistakes on one passage with a single LLM request.
+
+    Cached diagnoses are reused; the rest are requested together and split back
+    per question. Any question missing from (or unparseable in) the batched answer
+    falls back to its own analyze_mistake call, under the same deadline and with
+    the matching entry of `fallbacks`.
+    """
+    fallbacks = fallbacks or [None] * len(mistakes)
+    results: List[Optional[MistakeDiagnosis]] = [None] * len(mistakes)
+    keys: List[Optional[str]] = [None] * len(mistakes)
+    for i, (question, user_wrong_answer, correct_answer) in enumerate(mistakes):
+        try:
+            keys[i] = diagnosis_fingerprint(render_mistake_prompt(passage, question, user_wrong_answer, correct_answer))
+        except Exception as e:
+            print(f"Error preparing prompt: {e}")
+            continue
+        cached = await diagnosis_cache.get(keys[i])
+        if cached is not None:
+            results[i] = MistakeDiagnosis(**cached)
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if len(pending) > 1:
+        try:
+            prompt = render_batch_mistake_prompt(passage, [mistakes[i] for i in pending])
+
+            async def fetch() -> Dict[int, MistakeDiagnosis]:
+                data = await llm_hedger.run(
+                    "batch_mistake_analyse",
+                    lambda: _chat_json(ANALYZE_SYSTEM_PROMPT, prompt, PRIORITY_INTERACTIVE,
+                                       "batch_mistake_analyse", output_tokens=EXPECTED_OUTPUT_TOKENS * len(pending))
+                )
+                by_question = {}
+                for item in data.get("diagnoses", []):
+                    try:
+                        by_question[int(item["question_id"])] = _diagnosis_from(item)
+                    except (KeyError, TypeError, ValueError):
+                        continue
+
+                # Same inputs and model as the single-question prompt, so later single lookups reuse it.
+                # Done here so the cache is filled even if the caller's deadline already passed.
+                for i in pending:
+                    diagnosis = by_question.get(mistakes[i][0].id)
+                    if diagnosis is not None and keys[i] is not None:
+                        await diagnosis_cache.put(keys[i], diagnosis.model_dump())
+                return by_question
+
+            by_question = await within(deadline, llm_singleflight.do(cache_key(MODEL, ANALYZE_SYSTEM_PROMPT, prompt), fetch))
+            for i in pending:
+                results[i] = by_question.get(mistakes[i][0].id)
+        except asyncio.TimeoutError:
+            print("Batch diagnosis missed its deadline, falling back per question")
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            print(f"LLM Error in batch analyze, falling back to per-question calls: {e}")
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        diagnoses = await asyncio.gather(*(
+            analyze_mistake(passage, *mistakes[i], deadline=deadline, fallback=fallbacks[i]) for i in missing
+        ))
+        for i, diagnosis in zip(missing, diagnoses):
+            results[i] = diagnosis
+
+    return results
+
+
+def render_summary_prompt(
+    original_score: int,
+    final_mastery: float,
+    traps_identified: List[str],
+    exam_date: str
+) -> str:
+    """
+    Renders the summary prompt from the preloaded template. Raises if it cannot be rendered.
+    """
+    return prompt_registry.render(
+        "summarise",
+        name="Student",
+        original_score=original_score,
+        final_mastery=final_mastery,
+        traps_identified=", ".join(traps_identified) if traps_identified else "None",
+        exam_date=exam_date
+    )
+
+
+def _coach_message_from(data: dict) -> CoachMessage:
+    return CoachMessage(
+        headline=data.get("headline", "Session Summary"),
+        body=data.get("body", "Keep practicing.")
+    )
+
+
+FALLBACK_COACH_MESSAGE = CoachMessage(
+    headline="Session Complete",
+    body="Good job completing the drill."
+)
+
+
 async def generate_summary(
     original_score: int, 
     final_mastery: float, 
@@ -91,49 +367,123 @@ async def generate_summary(
     Generates a motivational summary.
     """
     
-    # Load prompt template
+    # Render prompt template
     try:
-        # Resolves to backend/prompts/summarise.txt
-        prompt_path = Path(__file__).parent.parent / "prompts" / "summarise.txt"
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            prompt_template = f.read()
-            
-        prompt = prompt_template.format(
-            name="Student",
-            original_score=original_score,
-            final_mastery=final_mastery,
-            traps_identified=", ".join(traps_identified) if traps_identified else "None",
-            exam_date=exam_date
-        )
+        prompt = render_summary_prompt(original_score, final_mastery, traps_identified, exam_date)
     except Exception as e:
         print(f"Error preparing summary prompt: {e}")
-        return CoachMessage(
-            headline="Session Complete",
-            body="Good job completing the drill."
-        )
+        return FALLBACK_COACH_MESSAGE
     
+    async def fetch() -> CoachMessage:
+        data = await _chat_json(SUMMARY_SYSTEM_PROMPT, prompt, PRIORITY_SUMMARY, "summarise")
+        return _coach_message_from(data)
+
     try:
-        response = await client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a tough GRE drill sergeant. Output valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            stream=False,
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        
-        return CoachMessage(
-            headline=data.get("headline", "Session Summary"),
-            body=data.get("body", "Keep practicing.")
-        )
-        
+        return await llm_singleflight.do(cache_key(MODEL, SUMMARY_SYSTEM_PROMPT, prompt), fetch)
+    except CircuitOpenError:
+        return FALLBACK_COACH_MESSAGE
     except Exception as e:
         print(f"LLM Error in summary: {e}")
-        return CoachMessage(
-            headline="Session Complete",
-            body="Good job completing the drill."
-        )
+        return FALLBACK_COACH_MESSAGE
+
+
+class SummaryTruncated:
+    """
+    Last item of a summary stream that failed after some text was already sent.
+    """
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+async def _pump_summary(prompt: str, queue: asyncio.Queue):
+    """
+    Reads the provider stream for a summary prompt into `queue`: (field, text)
+    deltas as they arrive, then the CoachMessage, or the exception that ended
+    the stream. The scheduler slot is held only while the provider is streaming.
+    """
+    fields = PartialJsonFields(["headline", "body"])
+    content = []
+    try:
+        estimated = estimate_tokens(SUMMARY_SYSTEM_PROMPT, prompt) + EXPECTED_OUTPUT_TOKENS
+        llm_breaker.check()
+        async with llm_scheduler.slot(PRIORITY_SUMMARY, estimated) as reservation:
+            # Timed until the provider's last chunk
+            with _timed_call("summarise"):
+                # Guards opening the stream (time to first byte); mid-stream errors end the stream below
+                async with llm_breaker.guard():
+                    stream = await llm_provider.chat_completion(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        stream=True,
+                        # Usage (including prefix-cache hits) arrives in a final chunk without choices
+                        stream_options={"include_usage": True},
+                        response_format={"type": "json_object"}
+                    )
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if usage is not None:
+                        reservation.settle(getattr(usage, "total_tokens", None))
+                        _record_usage("summarise", usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    content.append(delta)
+                    for field, text in fields.feed(delta):
+                        queue.put_nowait((field, text))
+
+        queue.put_nowait(_coach_message_from(json.loads("".join(content))))
+    except CircuitOpenError as e:
+        queue.put_nowait(e)
+    except Exception as e:
+        print(f"LLM Error in summary stream: {e}")
+        queue.put_nowait(e)
+
+
+async def stream_summary(
+    original_score: int,
+    final_mastery: float,
+    traps_identified: List[str],
+    exam_date: str
+) -> AsyncIterator[Union[Tuple[str, str], CoachMessage, SummaryTruncated]]:
+    """
+    Streams the coach summary. Yields (field, text) pairs with the new text of
+    "headline" or "body" as tokens arrive, then the validated CoachMessage last.
+    An error before any text was sent ends the stream with the fallback message;
+    after that it ends with SummaryTruncated, never a message contradicting the text sent.
+
+    The provider stream is read by a separate task, so a slow client never holds
+    an LLM scheduler slot; if the client goes away the upstream call is cancelled.
+    """
+    try:
+        prompt = render_summary_prompt(original_score, final_mastery, traps_identified, exam_date)
+    except Exception as e:
+        print(f"Error preparing summary prompt: {e}")
+        yield FALLBACK_COACH_MESSAGE
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    pump = asyncio.create_task(_pump_summary(prompt, queue))
+    sent = False
+    try:
+        while True:
+            item = await queue.get()
+            if not isinstance(item, tuple):
+                break
+            sent = True
+            yield item
+    finally:
+        if not pump.done():
+            pump.cancel()
+
+    if isinstance(item, CoachMessage):
+        yield item
+    elif sent:
+        yield SummaryTruncated(f"Summary stream failed: {item}")
+    else:
+        yield FALLBACK_COACH_MESSAGE
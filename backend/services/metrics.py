@@ -0,0 +1,242 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are created once at import time by the module
+that updates them and are served together from GET /metrics. Components that
+already keep a stats() dict are exported as well, by registering the function;
+its numeric values are read on every scrape.
+
+Metrics are per process: with several uvicorn workers, each one reports its own.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prefix for every exported metric name
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "gre")
+
+# Upper bounds (seconds) for latency histograms; LLM calls get a longer tail
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[object]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, LabelValues, Sequence[str], float]]:
+        """
+        (name suffix, label values, extra label names, value) for every sample.
+        """
+        ...
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra_names, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.label_names + tuple(extra_names), values)} "
+                         f"{_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in fixed buckets, plus their sum and count.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf slot, [sum, count])
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+        series[1][1] += 1
+
+    def samples(self):
+        result = []
+        for key, (counts, (total, count)) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                result.append(("_bucket", key + (_format_value(bound),), ("le",), cumulative))
+            result.append(("_sum", key, (), round(total, 6)))
+            result.append(("_count", key, (), count))
+        return result
+
+
+def _flatten_stats(stats: Dict[str, object], label: Optional[str],
+                   parent: Tuple[str, ...] = ()) -> List[Tuple[str, Dict[str, str], float]]:
+    """
+    Turn a stats() dict into (key, labels, value) samples. Numbers and booleans
+    are exported as is; a string becomes a 1-valued sample labelled with it;
+    nested dicts are labelled with their key under `label`.
+    """
+    samples = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            if label is not None and not parent:
+                samples.extend(_flatten_stats(value, label, (key,)))
+            continue
+        labels = {label: parent[0]} if parent else {}
+        if isinstance(value, bool):
+            samples.append((key, labels, int(value)))
+        elif isinstance(value, (int, float)):
+            samples.append((key, labels, value))
+        elif isinstance(value, str):
+            samples.append((key, {**labels, key: value}, 1))
+    return samples
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process and renders them for a scrape.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        # component name -> (stats function, label for nested dict keys)
+        self._stats: Dict[str, Tuple[Callable[[], Dict[str, object]], Optional[str]]] = {}
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self._name(name), help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self._name(name), help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self._name(name), help_text, labels, buckets))
+
+    def register_stats(self, component: str, stats: Callable[[], Dict[str, object]],
+                       label: Optional[str] = None):
+        """
+        Export a component's stats() dict as `<namespace>_<component>_<key>`.
+        Pass `label` when the dict is keyed by name (e.g. per template).
+        """
+        self._stats[component] = (stats, label)
+
+    def _render_stats(self, component: str, stats: Callable[[], Dict[str, object]],
+                      label: Optional[str]) -> List[str]:
+        try:
+            samples = _flatten_stats(stats(), label)
+        except Exception as e:
+            print(f"[Metrics] stats() of {component} failed: {e}")
+            return []
+        # Samples of one metric must be adjacent in the output
+        samples.sort(key=lambda sample: sample[0])
+        lines = []
+        typed = set()
+        for key, labels, value in samples:
+            name = self._name(f"{component}_{key}")
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} untyped")
+            lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for component, (stats, label) in self._stats.items():
+            lines.extend(self._render_stats(component, stats, label))
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,106 @@
+"""
+Short-lived cache of authenticated users, keyed by access token.
+
+get_current_user resolves a bearer token to a user profile. The first request
+with a token verifies it and loads the user; later requests with the same token
+are answered from here without decoding the JWT or querying the database.
+Entries live for PRINCIPAL_CACHE_TTL_SECONDS (never past the token's own
+expiry) and are dropped as soon as the user's profile changes.
+
+The cache is per process: another worker may serve a changed profile for up to
+the TTL, so keep it short.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from schemas import UserResponse
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+
+def token_signature(token: str) -> str:
+    # Last segment of a JWS: unique per token, and cheap to take
+    return token.rpartition(".")[2]
+
+
+class PrincipalCache:
+    """
+    LRU + TTL map of token signature -> UserResponse snapshot.
+
+    Entries also keep the full token, so a forged token that reuses a valid
+    signature with a different payload never matches.
+    """
+
+    def __init__(self, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS,
+                 max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # signature -> (token, expires_at, principal)
+        self._entries: "OrderedDict[str, Tuple[str, float, UserResponse]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[UserResponse]:
+        signature = token_signature(token)
+        entry = self._entries.get(signature)
+        if entry is None or entry[0] != token:
+            self.misses += 1
+            return None
+        if time.time() >= entry[1]:
+            self._drop(signature)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(signature)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, token: str, principal: UserResponse, token_expires_at: Optional[float] = None):
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        signature = token_signature(token)
+        self._drop(signature)
+        self._entries[signature] = (token, expires_at, principal)
+        self._by_user.setdefault(principal.id, set()).add(signature)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """
+        Forget every cached token of this user (call after changing the profile).
+        """
+        signatures = self._by_user.pop(user_id, set())
+        for signature in signatures:
+            self._entries.pop(signature, None)
+        if signatures:
+            self.invalidations += 1
+
+    def _drop(self, signature: str):
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        signatures = self._by_user.get(entry[2].id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry[2].id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+# Singleton instance
+principal_cache = PrincipalCache()
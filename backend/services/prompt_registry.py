@@ -0,0 +1,233 @@
+"""
+Prompt template registry.
+
+Every template under backend/prompts is read and parsed once at startup, so
+rendering a prompt never touches the disk. Each template carries a version (a
+hash of its text) and can be reloaded in place when the files change.
+
+Templates are laid out static-first: instructions, then the passage, then the
+per-attempt data, so consecutive requests share the longest possible prefix and
+the provider can serve it from its context cache. The registry also keeps, per
+template, how many prompt tokens the provider reported as cache hits.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from string import Formatter
+from typing import Dict, FrozenSet, Optional, Tuple
+
+PROMPTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "prompts"
+)
+
+# How often the watcher checks prompts/*.txt for edits (0 disables hot reload)
+PROMPT_POLL_SECONDS = float(os.getenv("PROMPT_POLL_SECONDS", "0"))
+
+# (literal text, field name or None)
+Segment = Tuple[str, Optional[str]]
+
+
+class PromptTemplateError(Exception):
+    """Raised for unknown templates, malformed templates or missing render values."""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A parsed template. Placeholders use str.format syntax ({field}, {{ for a literal brace)."""
+    name: str
+    version: str
+    text: str
+    segments: Tuple[Segment, ...]
+    fields: FrozenSet[str]
+
+    @classmethod
+    def compile(cls, name: str, text: str) -> "PromptTemplate":
+        segments = []
+        try:
+            for literal, field, spec, conversion in Formatter().parse(text):
+                if field is not None and (not field.isidentifier() or spec or conversion):
+                    raise PromptTemplateError(f"{name}: unsupported placeholder {{{field}}}")
+                segments.append((literal, field))
+        except ValueError as e:
+            raise PromptTemplateError(f"{name}: {e}")
+
+        return cls(
+            name=name,
+            version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+            text=text,
+            segments=tuple(segments),
+            fields=frozenset(field for _, field in segments if field is not None)
+        )
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise PromptTemplateError(f"{self.name}: missing values for {', '.join(sorted(missing))}")
+
+        parts = []
+        for literal, field in self.segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """
+    All templates in a directory, keyed by file name without the .txt suffix.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._fingerprints: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Per template: calls, prompt_tokens, cached_tokens as reported by the provider
+        self._usage: Dict[str, Dict[str, int]] = {}
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        fingerprints = {}
+        for filename in os.listdir(self.prompts_dir):
+            if not filename.endswith(".txt"):
+                continue
+            st = os.stat(os.path.join(self.prompts_dir, filename))
+            fingerprints[filename[:-len(".txt")]] = (st.st_mtime_ns, st.st_size)
+        return fingerprints
+
+    def _read(self, name: str) -> PromptTemplate:
+        with open(os.path.join(self.prompts_dir, f"{name}.txt"), "r", encoding="utf-8") as f:
+            return PromptTemplate.compile(name, f.read())
+
+    def load(self):
+        """
+        (Re)load every template. Raises if any template is malformed; the
+        previous templates stay in place in that case.
+        """
+        fingerprints = self._scan()
+        templates = {name: self._read(name) for name in fingerprints}
+        with self._lock:
+            self._templates = templates
+            self._fingerprints = fingerprints
+            self._loaded = True
+        print(f"[PromptRegistry] Loaded {len(templates)} templates: "
+              + ", ".join(f"{t.name}@{t.version}" for t in templates.values()))
+
+    def refresh(self) -> bool:
+        """
+        Reload only the templates whose files changed. Returns True if anything changed.
+        """
+        if not self._loaded:
+            self.load()
+            return True
+
+        fingerprints = self._scan()
+        if fingerprints == self._fingerprints:
+            return False
+
+        templates = {}
+        for name, fingerprint in fingerprints.items():
+            current = self._templates.get(name)
+            if current is not None and self._fingerprints.get(name) == fingerprint:
+                templates[name] = current
+                continue
+            try:
+                templates[name] = self._read(name)
+            except (OSError, PromptTemplateError) as e:
+                # Keep serving the last good version of a template that fails to load
+                print(f"[PromptRegistry] Keeping previous {name}: {e}")
+                if current is None:
+                    continue
+                templates[name] = current
+            if current is None or templates[name].version != current.version:
+                print(f"[PromptRegistry] {name} -> {templates[name].version}")
+
+        with self._lock:
+            self._templates = templates
+            self._fingerprints = fingerprints
+        return True
+
+    def get(self, name: str) -> PromptTemplate:
+        if not self._loaded:
+            self.load()
+        template = self._templates.get(name)
+        if template is None:
+            raise PromptTemplateError(f"Unknown prompt template: {name}")
+        return template
+
+    def render(self, template: str, /, **values) -> str:
+        # Positional-only, so templates may use a {name} placeholder
+        return self.get(template).render(**values)
+
+    def record_usage(self, name: str, usage) -> Optional[int]:
+        """
+        Record a completion's prompt usage for a template. Reads DeepSeek's
+        prompt_cache_hit_tokens or OpenAI's prompt_tokens_details.cached_tokens.
+        Returns the cached token count (None if the provider did not report one).
+        """
+        if usage is None:
+            return None
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None)
+
+        counters = self._usage.setdefault(name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        counters["calls"] += 1
+        counters["prompt_tokens"] += getattr(usage, "prompt_tokens", None) or 0
+        counters["cached_tokens"] += cached or 0
+        return cached
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        result = {}
+        for name, template in sorted(self._templates.items()):
+            counters = self._usage.get(name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            prompt_tokens = counters["prompt_tokens"]
+            result[name] = {
+                "version": template.version,
+                **counters,
+                "cache_hit_ratio": round(counters["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+            }
+        return result
+
+
+class PromptRegistryWatcher:
+    """
+    Background task that polls the prompts directory and hot-reloads changed templates.
+    """
+
+    def __init__(self, registry: PromptRegistry, interval: float = PROMPT_POLL_SECONDS):
+        self.registry = registry
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.registry.refresh)
+            except Exception as e:
+                print(f"[PromptRegistry] Reload failed: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Singleton instances
+prompt_registry = PromptRegistry()
+prompt_registry_watcher = PromptRegistryWatcher(prompt_registry)
@@ -0,0 +1,335 @@
+"""
+In-memory question bank.
+
+Every passage under backend/questions is loaded, validated and turned into
+Passage/Question objects once. Sessions are then served by picking from
+prebuilt indexes, so the request path never touches the disk. A background
+watcher picks up edits to the passage files without a restart.
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from schemas import Passage, Question
+
+QUESTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "questions"
+)
+
+# Optional compiled pack (see services/question_pack.py). When set, the bank is
+# served from the memory-mapped pack instead of the JSON files.
+QUESTION_PACK_PATH = os.getenv("QUESTION_PACK_PATH", "")
+
+# How often the watcher checks questions/*.json for edits (0 disables hot reload)
+QUESTION_BANK_POLL_SECONDS = float(os.getenv("QUESTION_BANK_POLL_SECONDS", "2.0"))
+
+
+class QuestionBankError(Exception):
+    """Raised when the bank has no usable passages or a passage is invalid."""
+
+
+@dataclass(frozen=True)
+class PassageEntry:
+    """A validated passage together with its prebuilt questions."""
+    passage_id: str
+    source_file: str
+    difficulty: Optional[str]
+    passage: Passage
+    questions: Tuple[Question, ...]
+
+    @property
+    def question_count(self) -> int:
+        return len(self.questions)
+
+
+@dataclass(frozen=True)
+class BankSnapshot:
+    """Immutable view of the bank: entries plus the lookup indexes."""
+    entries: Dict[str, PassageEntry] = field(default_factory=dict)
+    all_ids: Tuple[str, ...] = ()
+    by_difficulty: Dict[Optional[str], Tuple[str, ...]] = field(default_factory=dict)
+    by_question_count: Dict[int, Tuple[str, ...]] = field(default_factory=dict)
+    by_difficulty_and_count: Dict[Tuple[Optional[str], int], Tuple[str, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, entries: List[PassageEntry]) -> "BankSnapshot":
+        by_id: Dict[str, PassageEntry] = {}
+        by_difficulty: Dict[Optional[str], List[str]] = {}
+        by_question_count: Dict[int, List[str]] = {}
+        by_difficulty_and_count: Dict[Tuple[Optional[str], int], List[str]] = {}
+
+        for entry in sorted(entries, key=lambda e: e.passage_id):
+            if entry.passage_id in by_id:
+                print(f"[QuestionBank] Duplicate passage id {entry.passage_id} in {entry.source_file}, skipping")
+                continue
+            by_id[entry.passage_id] = entry
+            by_difficulty.setdefault(entry.difficulty, []).append(entry.passage_id)
+            by_question_count.setdefault(entry.question_count, []).append(entry.passage_id)
+            by_difficulty_and_count.setdefault((entry.difficulty, entry.question_count), []).append(entry.passage_id)
+
+        return cls(
+            entries=by_id,
+            all_ids=tuple(by_id),
+            by_difficulty={k: tuple(v) for k, v in by_difficulty.items()},
+            by_question_count={k: tuple(v) for k, v in by_question_count.items()},
+            by_difficulty_and_count={k: tuple(v) for k, v in by_difficulty_and_count.items()},
+        )
+
+    def __len__(self) -> int:
+        return len(self.all_ids)
+
+    def get(self, passage_id: str) -> Optional[PassageEntry]:
+        return self.entries.get(passage_id)
+
+
+def parse_question_id(raw) -> int:
+    """
+    Parse "q_001" -> 1, or "1" -> 1, falling back to a checksum of the string.
+    """
+    try:
+        raw_id = str(raw)
+        if "_" in raw_id:
+            return int(raw_id.split("_")[1])
+        return int(raw_id)
+    except (IndexError, ValueError, AttributeError):
+        # Fallback if id format is different. crc32, unlike hash(), gives the same id in
+        # every process, so ids stored in shared session/diagnosis stores stay valid
+        return zlib.crc32(str(raw).encode("utf-8")) % 100000
+
+
+def build_entry(passage_data: dict, source_file: str) -> PassageEntry:
+    """
+    Validate one raw passage dict and build its PassageEntry.
+    """
+    stem = os.path.splitext(os.path.basename(source_file))[0]
+    passage_id = str(passage_data.get("id") or stem)
+
+    text = passage_data.get("text")
+    if not text:
+        raise QuestionBankError(f"{passage_id}: passage text is empty")
+
+    raw_questions = passage_data.get("questions") or []
+    if not raw_questions:
+        raise QuestionBankError(f"{passage_id}: passage has no questions")
+
+    questions = []
+    seen_ids = set()
+    for q in raw_questions:
+        q_id = parse_question_id(q.get("id"))
+        if q_id in seen_ids:
+            raise QuestionBankError(f"{passage_id}: duplicate question id {q_id}")
+        seen_ids.add(q_id)
+
+        options = q.get("options") or {}
+        if not options:
+            raise QuestionBankError(f"{passage_id}: question {q_id} has no options")
+        if q.get("correct_option") not in options:
+            raise QuestionBankError(f"{passage_id}: question {q_id} correct_option is not one of its options")
+
+        questions.append(Question(
+            id=q_id,
+            text=q["question_text"],
+            options=options,
+            correct_option=q["correct_option"]
+        ))
+
+    return PassageEntry(
+        passage_id=passage_id,
+        source_file=os.path.basename(source_file),
+        difficulty=passage_data.get("difficulty"),
+        passage=Passage(title=f"Passage {stem}", text=text),
+        questions=tuple(questions),
+    )
+
+
+def load_passage_file(file_path: str) -> List[PassageEntry]:
+    """
+    Load every passage in a single questions/*.json file.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = [data]
+    return [build_entry(passage_data, file_path) for passage_data in data]
+
+
+def is_passage_file(filename: str) -> bool:
+    return filename.startswith("passage") and filename.endswith(".json")
+
+
+Fingerprint = Tuple[int, int]  # (mtime_ns, size)
+
+
+class QuestionBank:
+    """
+    Holds the current BankSnapshot and serves passage picks from it.
+
+    The snapshot is rebuilt off to the side and swapped in with a single
+    reference assignment, so readers never block and never see a partial bank.
+    """
+
+    def __init__(self, questions_dir: str = QUESTIONS_DIR, pack_path: str = QUESTION_PACK_PATH):
+        self.questions_dir = questions_dir
+        self.pack_path = pack_path
+        self._snapshot = None  # BankSnapshot, or PackedSnapshot in pack mode
+        self._fingerprints: Dict[str, Fingerprint] = {}
+        self._file_entries: Dict[str, List[PassageEntry]] = {}
+        self._write_lock = threading.Lock()
+
+    def _scan(self) -> Dict[str, Fingerprint]:
+        fingerprints = {}
+        for filename in os.listdir(self.questions_dir):
+            if not is_passage_file(filename):
+                continue
+            try:
+                st = os.stat(os.path.join(self.questions_dir, filename))
+            except FileNotFoundError:
+                continue  # Removed between listdir and stat
+            fingerprints[filename] = (st.st_mtime_ns, st.st_size)
+        return fingerprints
+
+    def refresh(self) -> bool:
+        """
+        Re-parse only the passage files whose fingerprint changed and swap in a
+        new snapshot. Returns True if the bank changed.
+
+        A file that fails to parse keeps serving its previous passages until it is fixed.
+        """
+        if self.pack_path:
+            return self._refresh_pack()
+
+        with self._write_lock:
+            current = self._scan()
+            changed = [f for f, fp in current.items() if self._fingerprints.get(f) != fp]
+            removed = [f for f in self._fingerprints if f not in current]
+            if not changed and not removed and self._snapshot is not None:
+                return False
+
+            file_entries = dict(self._file_entries)
+            for filename in removed:
+                file_entries.pop(filename, None)
+            for filename in changed:
+                try:
+                    file_entries[filename] = load_passage_file(os.path.join(self.questions_dir, filename))
+                except Exception as e:
+                    print(f"[QuestionBank] Skipping {filename}: {e}")
+
+            snapshot = BankSnapshot.build([e for entries in file_entries.values() for e in entries])
+            if not len(snapshot):
+                if self._snapshot is None:
+                    raise QuestionBankError(f"No passage files found in {self.questions_dir}")
+                print("[QuestionBank] Reload produced an empty bank, keeping the previous snapshot")
+                return False
+
+            self._fingerprints = current
+            self._file_entries = file_entries
+            self._snapshot = snapshot
+
+        print(f"[QuestionBank] Loaded {len(snapshot)} passages "
+              f"({len(changed)} files parsed, {len(removed)} removed)")
+        return True
+
+    def _refresh_pack(self) -> bool:
+        from services.question_pack import PackedSnapshot
+
+        with self._write_lock:
+            st = os.stat(self.pack_path)
+            fingerprint = (st.st_mtime_ns, st.st_size)
+            if self._snapshot is not None and self._fingerprints.get(self.pack_path) == fingerprint:
+                return False
+
+            # The builder renames a new file into place, so the old mapping stays
+            # valid for readers still holding the previous snapshot.
+            snapshot = PackedSnapshot(self.pack_path)
+            if not len(snapshot):
+                raise QuestionBankError(f"Question pack {self.pack_path} is empty")
+            self._fingerprints = {self.pack_path: fingerprint}
+            self._snapshot = snapshot
+
+        print(f"[QuestionBank] Mapped {len(snapshot)} passages from {self.pack_path}")
+        return True
+
+    def load(self):
+        """
+        Read and validate every passage file. Invalid files are reported and skipped.
+        """
+        with self._write_lock:
+            self._fingerprints = {}
+            self._file_entries = {}
+            self._snapshot = None
+        self.refresh()
+        return self._snapshot
+
+    @property
+    def snapshot(self):
+        # Lazily load for scripts that use the service without the app lifespan
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def get(self, passage_id: str) -> Optional[PassageEntry]:
+        return self.snapshot.get(passage_id)
+
+    def pick(self, difficulty: Optional[str] = None, question_count: Optional[int] = None) -> PassageEntry:
+        """
+        Pick a random passage, preferring the requested difficulty and question count.
+        Falls back to the whole bank when no passage matches.
+        """
+        snapshot = self.snapshot
+        candidates = None
+        if question_count is not None:
+            candidates = (
+                snapshot.by_difficulty_and_count.get((difficulty, question_count))
+                or snapshot.by_question_count.get(question_count)
+            )
+        if not candidates:
+            candidates = snapshot.by_difficulty.get(difficulty) or snapshot.all_ids
+
+        return snapshot.get(random.choice(candidates))
+
+
+class QuestionBankWatcher:
+    """
+    Background task that polls the questions directory and hot-reloads the bank.
+    """
+
+    def __init__(self, bank: QuestionBank, interval: float = QUESTION_BANK_POLL_SECONDS):
+        self.bank = bank
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # stat() and json parsing run in a worker thread to keep the event loop free
+                await asyncio.to_thread(self.bank.refresh)
+            except Exception as e:
+                print(f"[QuestionBank] Reload failed: {e}")
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Singleton instances
+question_bank = QuestionBank()
+question_bank_watcher = QuestionBankWatcher(question_bank)
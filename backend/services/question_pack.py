@@ -0,0 +1,212 @@
+"""
+Packed, memory-mapped question bank format.
+
+`scripts/build_question_pack.py` compiles questions/*.json into one file:
+
+    header   magic, version, counts and section offsets
+    strings  interned string table: (offset, length) slots followed by a UTF-8 blob
+    index    one fixed-size row per passage: id, difficulty, question count, record offset
+    records  per passage: title, text, source file, then its questions and options
+
+Every text field is a reference into the string table, so repeated strings
+(option letters, difficulties, shared option text) are stored once. The server
+mmaps the file read-only, which lets all uvicorn workers share the same page
+cache, and only builds Passage/Question objects for the passages that are picked.
+"""
+
+import mmap
+import os
+import struct
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from schemas import Passage, Question
+from services.question_bank import PassageEntry
+
+MAGIC = b"GREQPK01"
+FORMAT_VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+# magic, version, passage_count, string_count, strings_offset, index_offset, records_offset
+HEADER = struct.Struct("<8sIIIQQQ")
+STRING_SLOT = struct.Struct("<QI")
+# passage_id, difficulty, question_count, record_offset
+INDEX_ROW = struct.Struct("<IIIQ")
+# title, text, source_file, question_count
+PASSAGE_RECORD = struct.Struct("<IIII")
+# id, text, correct_option, option_count
+QUESTION_RECORD = struct.Struct("<qIII")
+OPTION_RECORD = struct.Struct("<II")
+
+# Number of materialized passages kept per worker
+QUESTION_PACK_CACHE_SIZE = int(os.getenv("QUESTION_PACK_CACHE_SIZE", "256"))
+
+
+class QuestionPackError(Exception):
+    """Raised when a pack file is missing, truncated or of an unknown version."""
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[bytes] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = len(self.strings)
+            self.ids[value] = sid
+            self.strings.append(value.encode("utf-8"))
+        return sid
+
+
+def build_pack(entries: List[PassageEntry], output_path: str) -> int:
+    """
+    Write `entries` to `output_path` as a pack file. Returns the file size.
+
+    The file is written next to the target and renamed into place, so servers
+    that still have the old pack mapped keep reading a consistent file.
+    """
+    entries = sorted(entries, key=lambda e: e.passage_id)
+    table = _StringTable()
+
+    records = bytearray()
+    index_rows = []
+    for entry in entries:
+        index_rows.append((
+            table.intern(entry.passage_id),
+            table.intern(entry.difficulty),
+            entry.question_count,
+            len(records),
+        ))
+        records += PASSAGE_RECORD.pack(
+            table.intern(entry.passage.title),
+            table.intern(entry.passage.text),
+            table.intern(entry.source_file),
+            entry.question_count,
+        )
+        for question in entry.questions:
+            records += QUESTION_RECORD.pack(
+                question.id,
+                table.intern(question.text),
+                table.intern(question.correct_option),
+                len(question.options),
+            )
+            for key, value in question.options.items():
+                records += OPTION_RECORD.pack(table.intern(key), table.intern(value))
+
+    strings_offset = HEADER.size
+    blob_offset = strings_offset + STRING_SLOT.size * len(table.strings)
+    slots = bytearray()
+    blob = bytearray()
+    for raw in table.strings:
+        slots += STRING_SLOT.pack(blob_offset + len(blob), len(raw))
+        blob += raw
+
+    index_offset = blob_offset + len(blob)
+    index = b"".join(INDEX_ROW.pack(*row) for row in index_rows)
+    records_offset = index_offset + len(index)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(entries), len(table.strings),
+        strings_offset, index_offset, records_offset,
+    )
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for part in (header, slots, blob, index, records):
+            f.write(part)
+    os.replace(tmp_path, output_path)
+    return records_offset + len(records)
+
+
+class PackedSnapshot:
+    """
+    BankSnapshot-compatible view over a memory-mapped pack file.
+
+    The index is decoded eagerly (it is small); passages are materialized on
+    `get` and kept in a bounded LRU cache.
+    """
+
+    def __init__(self, path: str, cache_size: int = QUESTION_PACK_CACHE_SIZE):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise QuestionPackError(f"{path}: empty pack file")
+
+        if len(self._mm) < HEADER.size:
+            raise QuestionPackError(f"{path}: truncated header")
+        (magic, version, passage_count, self._string_count,
+         self._strings_offset, index_offset, self._records_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise QuestionPackError(f"{path}: unsupported pack format {magic!r} v{version}")
+
+        self._rows: Dict[str, Tuple[Optional[str], int]] = {}
+        by_difficulty: Dict[Optional[str], List[str]] = {}
+        by_question_count: Dict[int, List[str]] = {}
+        by_difficulty_and_count: Dict[Tuple[Optional[str], int], List[str]] = {}
+        for i in range(passage_count):
+            id_sid, difficulty_sid, question_count, record_offset = INDEX_ROW.unpack_from(
+                self._mm, index_offset + i * INDEX_ROW.size
+            )
+            passage_id = self._string(id_sid)
+            difficulty = self._string(difficulty_sid)
+            self._rows[passage_id] = (difficulty, self._records_offset + record_offset)
+            by_difficulty.setdefault(difficulty, []).append(passage_id)
+            by_question_count.setdefault(question_count, []).append(passage_id)
+            by_difficulty_and_count.setdefault((difficulty, question_count), []).append(passage_id)
+
+        self.all_ids: Tuple[str, ...] = tuple(self._rows)
+        self.by_difficulty = {k: tuple(v) for k, v in by_difficulty.items()}
+        self.by_question_count = {k: tuple(v) for k, v in by_question_count.items()}
+        self.by_difficulty_and_count = {k: tuple(v) for k, v in by_difficulty_and_count.items()}
+        self._materialize = lru_cache(maxsize=cache_size)(self._read_entry)
+
+    def __len__(self) -> int:
+        return len(self.all_ids)
+
+    def _string(self, sid: int) -> Optional[str]:
+        if sid == NO_STRING:
+            return None
+        if sid >= self._string_count:
+            raise QuestionPackError(f"{self.path}: string id {sid} out of range")
+        offset, length = STRING_SLOT.unpack_from(self._mm, self._strings_offset + sid * STRING_SLOT.size)
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def _read_entry(self, passage_id: str) -> PassageEntry:
+        difficulty, pos = self._rows[passage_id]
+        title_sid, text_sid, source_sid, question_count = PASSAGE_RECORD.unpack_from(self._mm, pos)
+        pos += PASSAGE_RECORD.size
+
+        questions = []
+        for _ in range(question_count):
+            q_id, q_text_sid, correct_sid, option_count = QUESTION_RECORD.unpack_from(self._mm, pos)
+            pos += QUESTION_RECORD.size
+            options = {}
+            for _ in range(option_count):
+                key_sid, value_sid = OPTION_RECORD.unpack_from(self._mm, pos)
+                pos += OPTION_RECORD.size
+                options[self._string(key_sid)] = self._string(value_sid)
+            questions.append(Question(
+                id=q_id,
+                text=self._string(q_text_sid),
+                options=options,
+                correct_option=self._string(correct_sid)
+            ))
+
+        return PassageEntry(
+            passage_id=passage_id,
+            source_file=self._string(source_sid),
+            difficulty=difficulty,
+            passage=Passage(title=self._string(title_sid), text=self._string(text_sid)),
+            questions=tuple(questions),
+        )
+
+    def get(self, passage_id: str) -> Optional[PassageEntry]:
+        if passage_id not in self._rows:
+            return None
+        return self._materialize(passage_id)
@@ -0,0 +1,76 @@
+"""
+Per-route HTTP latency and in-flight request metrics.
+
+RequestMetricsMiddleware is plain ASGI rather than @app.middleware("http"), so
+the timing of a streamed response (the NDJSON /session-summary/stream and
+/analyze-mistakes/stream endpoints) runs until its last line is sent, not just
+until the headers go out. Requests are labelled with the matched route's path
+template (e.g. "/auth/me"), never the raw URL, so a route with path parameters
+still maps to one series and the number of series stays bounded.
+"""
+
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics import metrics
+
+# Label for requests that match no route (404s, scanners)
+UNMATCHED_ROUTE = "unmatched"
+
+http_request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method", "route")
+)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that will handle this request.
+    """
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    partial = None
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # Path matches but the method does not (405)
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every HTTP request and tracks how many are in flight per route.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - started, method=method, route=route, status=status)
+            http_requests_in_flight.dec(method=method, route=route)
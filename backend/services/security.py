@@ -1,6 +1,9 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import jwt
 
 # Configuration (In production, these should be in environment variables)
@@ -8,11 +11,30 @@ SECRET_KEY = "AWAKEN_GRE_SUPER_SECRET_KEY"  # Change this!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Argon2 cost parameters (defaults match passlib's). Stored hashes made with other
+# parameters still verify, and are re-hashed with these on the user's next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST_KIB = int(os.getenv("ARGON2_MEMORY_COST_KIB", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# Worker threads for hashing (argon2 releases the GIL, so threads run in parallel)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash/verify calls admitted at once (running + queued); beyond this callers wait
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+# How long a caller waits for admission before the request is shed
+PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "5"))
+
 # Create a CryptContext object. This handles hashing and verification.
 # We use "argon2" as the hashing scheme.
 # "deprecated='auto'" allows it to verify older hashes if we change schemes later,
 # but marks them as deprecated so they can be re-hashed.
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=ARGON2_PARALLELISM
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -26,6 +48,88 @@ def get_password_hash(password: str) -> str:
     """
     return pwd_context.hash(password)
 
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already pending."""
+
+
+class PasswordHasher:
+    """
+    Runs argon2 hashing and verification on a bounded thread pool, so a login
+    spike queues up here instead of blocking the event loop for every other
+    request. At most `max_pending` calls are admitted at once; a caller that
+    cannot get in within `queue_timeout` gets PasswordHasherBusy.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS,
+                 max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admission = asyncio.Semaphore(self.max_pending)
+        self.pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="argon2")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        try:
+            await asyncio.wait_for(self._admission.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"{self.max_pending} password operations already pending")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            self.pending -= 1
+            self._admission.release()
+
+    async def hash(self, password: str) -> str:
+        result = await self._run(pwd_context.hash, password)
+        self.hashed += 1
+        return result
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        result = await self._run(pwd_context.verify, password, hashed_password)
+        self.verified += 1
+        return result
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify the password and, if the stored hash uses a deprecated scheme or
+        outdated cost parameters, return a replacement hash to store.
+        """
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed_password)
+        self.verified += 1
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+        }
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Creates a JWT access token.
@@ -39,3 +143,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+# Singleton instance
+password_hasher = PasswordHasher()
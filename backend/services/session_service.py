@@ -1,87 +1,53 @@
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import asyncio
+import os
 from schemas import (
     GenerateSessionResponse,
     AnalyzeMistakeResponse,
     SessionSummaryResponse,
+    CoachMessage,
     SessionData,
+    SessionRef,
     Question,
-    Passage
+    Passage,
+    MistakeDiagnosis
 )
 from services.llm_service import (
     analyze_mistake,
-    generate_summary
+    analyze_mistakes_batch,
+    generate_summary,
+    stream_summary,
+    SummaryTruncated,
+    render_mistake_prompt,
+    diagnosis_fingerprint
 )
+from services.llm_cache import diagnosis_cache
+from services.diagnosis_store import diagnosis_store
+from services.question_bank import question_bank
+from services.drill_recorder import drill_recorder
+from services.session_store import SessionStore, create_session_store
+from services.deadline import Deadline
+from services.trap_classifier import trap_classifier
+
+# Diagnose a session's mistakes with one LLM request (passage sent once) instead of one per mistake
+LLM_BATCH_DIAGNOSES = os.getenv("LLM_BATCH_DIAGNOSES", "1") == "1"
+
+# Time budget for diagnosing all of a submission's mistakes; late diagnoses fall back to stored ones
+ANALYZE_DEADLINE_SECONDS = float(os.getenv("ANALYZE_DEADLINE_SECONDS", "20"))
 
 class SessionService:
-    def __init__(self):
-        # In-memory storage
-        self.sessions: Dict[str, SessionData] = {}
+    def __init__(self, store: Optional[SessionStore] = None):
+        # Backend chosen by SESSION_STORE_BACKEND unless one is injected
+        self.store: SessionStore = store or create_session_store()
 
-    async def create_session(self, difficulty: str, exam_date: str) -> GenerateSessionResponse:
+    async def create_session(self, difficulty: str, exam_date: str, user_id: Optional[int] = None) -> GenerateSessionResponse:
         """
-        Generate a new session using local file (offline mode).
-        Randomly selects a passage from backend/questions/*.json
+        Generate a new session from the preloaded question bank (offline mode).
+        Randomly selects a passage of the requested difficulty, falling back to any passage.
         """
-        import json
-        import os
-        import random
-
-        # Load from local file
-        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        questions_dir = os.path.join(base_path, "questions")
-        
-        try:
-            # List all passage files
-            passage_files = [f for f in os.listdir(questions_dir) if f.startswith("passage") and f.endswith(".json")]
-            
-            if not passage_files:
-                 raise FileNotFoundError("No passage files found")
-
-            # TEMPORARY DEBUG: Filter out files with only 1 question to test frontend rendering
-            # We need to peek into files or just assume based on knowledge
-            # Let's just log what we picked
-            
-            selected_file = random.choice(passage_files)
-            file_path = os.path.join(questions_dir, selected_file)
-            
-            print(f"[DEBUG] Selected file: {selected_file}")
-
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                passage_data = data[0]
-                
-            questions_count = len(passage_data["questions"])
-            print(f"[DEBUG] Questions found in file: {questions_count}")
-            
-            passage = Passage(
-                title=f"Passage {selected_file.replace('.json', '')}", # Use filename as title or extract if avail
-                text=passage_data["text"]
-            )
-            
-            questions = []
-            for q in passage_data["questions"]:
-                # Parse "q_001" -> 1, or "1" -> 1, or hash string
-                try:
-                    raw_id = str(q["id"])
-                    if "_" in raw_id:
-                        q_id = int(raw_id.split("_")[1])
-                    else:
-                        q_id = int(raw_id)
-                except (IndexError, ValueError, AttributeError):
-                    # Fallback if id format is different
-                    q_id = abs(hash(str(q["id"]))) % 100000 
-                
-                questions.append(Question(
-                    id=q_id,
-                    text=q["question_text"],
-                    options=q["options"],
-                    correct_option=q["correct_option"]
-                ))
-                
-        except Exception as e:
-            print(f"Error loading local file: {e}")
-            raise e
+        entry = question_bank.pick(difficulty)
+        passage = entry.passage
+        questions = list(entry.questions)
 
         # Create response object (which generates session_id)
         response = GenerateSessionResponse(
@@ -89,68 +55,215 @@ class SessionService:
             questions=questions
         )
 
-        # Store session data in memory
-        self.sessions[response.session_id] = SessionData(
+        # Store a reference to the bank entry rather than a copy of the passage
+        await self.store.put(SessionRef(
             session_id=response.session_id,
-            passage=passage,
-            questions=questions,
+            passage_id=entry.passage_id,
+            question_ids=[q.id for q in questions],
             difficulty=difficulty,
             exam_date=exam_date
+        ))
+
+        # Durable history is written behind the request
+        drill_recorder.record_session(
+            session_id=response.session_id,
+            user_id=user_id,
+            difficulty=difficulty,
+            exam_date=exam_date,
+            passage_id=entry.passage_id,
+            question_ids=[q.id for q in questions]
         )
 
         return response
 
     async def get_session(self, session_id: str) -> Optional[SessionData]:
-        return self.sessions.get(session_id)
+        ref = await self.store.get(session_id)
+        if ref is None:
+            return None
 
-    async def analyze_mistakes(self, session_id: str, answers: Dict[str, str]) -> List[AnalyzeMistakeResponse]:
+        entry = question_bank.get(ref.passage_id)
+        if entry is None:
+            # Passage was removed from the bank since the session started
+            return None
+
+        questions_by_id = {q.id: q for q in entry.questions}
+        return SessionData(
+            session_id=ref.session_id,
+            passage_id=ref.passage_id,
+            passage=entry.passage,
+            questions=[questions_by_id[q_id] for q_id in ref.question_ids if q_id in questions_by_id],
+            difficulty=ref.difficulty,
+            exam_date=ref.exam_date
+        )
+
+    async def _precomputed(self, session: SessionData, question: Question, user_answer: str,
+                           correct_answer: str) -> Tuple[Optional[MistakeDiagnosis], Optional[MistakeDiagnosis]]:
         """
-        Analyze mistakes for a given session.
+        The known LLM diagnosis for this mistake as (fresh, stale): `fresh` if one is
+        cached or stored and up to date, otherwise `stale` if one exists from an older prompt.
         """
-        session = self.sessions.get(session_id)
-        if not session:
-            return None
+        try:
+            fingerprint = diagnosis_fingerprint(
+                render_mistake_prompt(session.passage, question, user_answer, correct_answer)
+            )
+            cached = await diagnosis_cache.get(fingerprint)
+            if cached is not None:
+                return MistakeDiagnosis(**cached), None
+            diagnosis, fresh = await diagnosis_store.lookup(session.passage_id, question.id, user_answer, fingerprint)
+            return (diagnosis, None) if fresh else (None, diagnosis)
+        except Exception as e:
+            print(f"Diagnosis lookup failed: {e}")
+            return None, None
+
+    async def _diagnose(self, session: SessionData, question: Question, user_answer: str,
+                        correct_answer: str, deadline: Optional[Deadline] = None) -> MistakeDiagnosis:
+        """
+        Use a cached or precomputed LLM diagnosis when it is up to date, then a confident
+        local classification (if enabled), otherwise ask the LLM.
+        """
+        precomputed, stale = await self._precomputed(session, question, user_answer, correct_answer)
+        if precomputed is not None:
+            return precomputed
+
+        local = trap_classifier.confident_diagnosis(session.passage, question, user_answer)
+        if local is not None:
+            return local
+
+        return await analyze_mistake(
+            passage=session.passage,
+            question=question,
+            user_wrong_answer=user_answer,
+            correct_answer=correct_answer,
+            deadline=deadline,
+            fallback=stale
+        )
+
+    async def _diagnose_all(self, session: SessionData, mistakes: List[dict],
+                            deadline: Optional[Deadline] = None) -> List[MistakeDiagnosis]:
+        """
+        Diagnose every mistake: cached or precomputed LLM diagnoses and confident local
+        classifications (if enabled) first, then one batched LLM request for the rest (or parallel single calls when batching is off).
+        Anything not answered by the deadline gets an older precomputed diagnosis if one exists.
+        """
+        lookups = await asyncio.gather(*(
+            self._precomputed(session, m["question"], m["user_answer"], m["correct_answer"])
+            for m in mistakes
+        ))
+        diagnoses = [
+            fresh or trap_classifier.confident_diagnosis(session.passage, m["question"], m["user_answer"])
+            for (fresh, _), m in zip(lookups, mistakes)
+        ]
+        pending = [i for i, diagnosis in enumerate(diagnoses) if diagnosis is None]
+        if not pending:
+            return diagnoses
+
+        if LLM_BATCH_DIAGNOSES and len(pending) > 1:
+            results = await analyze_mistakes_batch(
+                session.passage,
+                [(mistakes[i]["question"], mistakes[i]["user_answer"], mistakes[i]["correct_answer"]) for i in pending],
+                deadline=deadline,
+                fallbacks=[lookups[i][1] for i in pending]
+            )
+        else:
+            # Spawn PARALLEL LLM calls (one per mistake)
+            results = await asyncio.gather(*(
+                analyze_mistake(
+                    passage=session.passage,
+                    question=mistakes[i]["question"],
+                    user_wrong_answer=mistakes[i]["user_answer"],
+                    correct_answer=mistakes[i]["correct_answer"],
+                    deadline=deadline,
+                    fallback=lookups[i][1]
+                )
+                for i in pending
+            ))
 
-        # Identify wrong answers
+        for i, diagnosis in zip(pending, results):
+            diagnoses[i] = diagnosis
+        return diagnoses
+
+    def _collect_mistakes(self, session: SessionData, answers: Dict[str, str]) -> List[dict]:
+        """
+        Identify wrong answers. Correct answers are recorded straight away.
+        """
         mistakes = []
         for question in session.questions:
             user_answer = answers.get(question.id)
-            if user_answer and user_answer != question.correct_option:
+            if not user_answer:
+                continue
+            if user_answer != question.correct_option:
                 mistakes.append({
                     "question": question,
                     "user_answer": user_answer,
                     "correct_answer": question.correct_option
                 })
+            else:
+                drill_recorder.record_attempt(session.session_id, question.id, user_answer, question.correct_option)
+        return mistakes
+
+    async def _analyze_one(self, session: SessionData, mistake: dict,
+                           deadline: Optional[Deadline] = None) -> AnalyzeMistakeResponse:
+        diagnosis = await self._diagnose(
+            session,
+            question=mistake["question"],
+            user_answer=mistake["user_answer"],
+            correct_answer=mistake["correct_answer"],
+            deadline=deadline
+        )
+        return self._respond(session, mistake, diagnosis)
 
+    def _respond(self, session: SessionData, mistake: dict, diagnosis: MistakeDiagnosis) -> AnalyzeMistakeResponse:
+        drill_recorder.record_attempt(
+            session.session_id,
+            mistake["question"].id,
+            mistake["user_answer"],
+            mistake["correct_answer"],
+            trap_type=diagnosis.trap_type
+        )
+        return AnalyzeMistakeResponse(
+            question_id=mistake["question"].id,
+            user_mistake_diagnosis=diagnosis
+        )
+
+    async def analyze_mistakes(self, session_id: str, answers: Dict[str, str]) -> List[AnalyzeMistakeResponse]:
+        """
+        Analyze mistakes for a given session, within ANALYZE_DEADLINE_SECONDS overall.
+        """
+        deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
+        session = await self.get_session(session_id)
+        if not session:
+            return None
+
+        mistakes = self._collect_mistakes(session, answers)
         if not mistakes:
             return []
 
-        # Spawn PARALLEL LLM calls (one per mistake)
-        analysis_tasks = [
-            analyze_mistake(
-                passage=session.passage,
-                question=mistake["question"],
-                user_wrong_answer=mistake["user_answer"],
-                correct_answer=mistake["correct_answer"]
-            )
-            for mistake in mistakes
-        ]
+        diagnoses = await self._diagnose_all(session, mistakes, deadline)
+        return [self._respond(session, m, d) for m, d in zip(mistakes, diagnoses)]
 
-        # Wait for all analyses to complete
-        diagnoses = await asyncio.gather(*analysis_tasks)
+    async def stream_mistake_analyses(self, session_id: str,
+                                      answers: Dict[str, str]) -> Optional[AsyncIterator[AnalyzeMistakeResponse]]:
+        """
+        Like analyze_mistakes, but yields each analysis as soon as it is ready.
+        Mistakes are diagnosed with separate calls here, trading the batch's token
+        savings for a shorter time to the first hint. Returns None if the session does not exist (checked before streaming starts).
+        """
+        deadline = Deadline(ANALYZE_DEADLINE_SECONDS)
+        session = await self.get_session(session_id)
+        if not session:
+            return None
 
-        # Build responses
-        responses = [
-            AnalyzeMistakeResponse(
-                question_id=mistakes[i]["question"].id,
-                user_mistake_diagnosis=diagnoses[i]
-            )
-            for i in range(len(mistakes))
-        ]
+        mistakes = self._collect_mistakes(session, answers)
+
+        async def results():
+            # Tasks are left running if the client disconnects: their results still land in the cache
+            tasks = [asyncio.create_task(self._analyze_one(session, m, deadline)) for m in mistakes]
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
 
-        return responses
+        return results()
 
-    async def generate_session_summary(self, original_score: int, final_mastery: float, 
+    async def generate_session_summary(self, session_id: str, original_score: int, final_mastery: float,
                                      traps_identified: List[str], exam_date: str) -> SessionSummaryResponse:
         """
         Generate a motivational summary.
@@ -162,6 +275,45 @@ class SessionService:
             exam_date=exam_date
         )
 
+        return await self._finish_summary(session_id, original_score, final_mastery,
+                                          traps_identified, coach_message)
+
+    async def stream_session_summary(self, session_id: str, original_score: int, final_mastery: float,
+                                     traps_identified: List[str], exam_date: str) -> AsyncIterator[dict]:
+        """
+        Stream the summary: {"type": "delta", "field", "text"} events while the coach
+        message is generated, then {"type": "summary", "summary": SessionSummaryResponse},
+        or {"type": "error", "detail"} if generation failed after text was sent.
+        """
+        async for item in stream_summary(
+            original_score=original_score,
+            final_mastery=final_mastery,
+            traps_identified=traps_identified,
+            exam_date=exam_date
+        ):
+            if isinstance(item, CoachMessage):
+                summary = await self._finish_summary(session_id, original_score, final_mastery,
+                                                     traps_identified, item)
+                yield {"type": "summary", "summary": summary.model_dump()}
+            elif isinstance(item, SummaryTruncated):
+                yield {"type": "error", "detail": item.reason}
+            else:
+                field, text = item
+                yield {"type": "delta", "field": field, "text": text}
+
+    async def _finish_summary(self, session_id: str, original_score: int, final_mastery: float,
+                              traps_identified: List[str], coach_message: CoachMessage) -> SessionSummaryResponse:
+        # Only record summaries for sessions we issued (drill_summaries references drill_sessions)
+        if await self.store.get(session_id) is not None:
+            drill_recorder.record_summary(
+                session_id=session_id,
+                original_score=original_score,
+                final_mastery=final_mastery,
+                traps_identified=traps_identified,
+                headline=coach_message.headline,
+                body=coach_message.body
+            )
+
         return SessionSummaryResponse(
             original_score=original_score,
             final_mastery=final_mastery,
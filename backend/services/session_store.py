@@ -0,0 +1,256 @@
+"""
+Storage backends for drill session state.
+
+Stores hold SessionRef records (passage id + question ids), not copies of the
+passage, so entries stay small and can be shared between processes.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from schemas import SessionRef
+
+# "memory" keeps sessions per process; "sqlite" shares them across uvicorn workers
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_STORE_MAX_ENTRIES = int(os.getenv("SESSION_STORE_MAX_ENTRIES", "10000"))
+SESSION_STORE_TTL_SECONDS = float(os.getenv("SESSION_STORE_TTL_SECONDS", str(2 * 60 * 60)))
+SESSION_STORE_SQLITE_PATH = os.getenv(
+    "SESSION_STORE_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions.db")
+)
+
+
+class SessionStore(ABC):
+    """
+    Interface for session storage used by SessionService.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[SessionRef]:
+        ...
+
+    @abstractmethod
+    async def put(self, session: SessionRef) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def size(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Bounded per-process store with LRU eviction and an idle TTL.
+
+    Entries are kept in access order, so the least recently used (and therefore
+    longest idle) sessions are always at the front and can be dropped cheaply.
+    """
+
+    def __init__(self, max_entries: int = SESSION_STORE_MAX_ENTRIES,
+                 ttl_seconds: float = SESSION_STORE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, SessionRef]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - last_access > self.ttl_seconds
+
+    def _purge_expired(self, now: float):
+        while self._entries:
+            session_id, (last_access, _) = next(iter(self._entries.items()))
+            if not self._expired(last_access, now):
+                break
+            del self._entries[session_id]
+            self.expirations += 1
+
+    async def get(self, session_id: str) -> Optional[SessionRef]:
+        now = time.monotonic()
+        item = self._entries.get(session_id)
+        if item is None:
+            self.misses += 1
+            return None
+
+        last_access, session = item
+        if self._expired(last_access, now):
+            del self._entries[session_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries[session_id] = (now, session)
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return session
+
+    async def put(self, session: SessionRef) -> None:
+        now = time.monotonic()
+        self._purge_expired(now)
+
+        self._entries[session.session_id] = (now, session)
+        self._entries.move_to_end(session.session_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    async def size(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Cross-process store backed by a SQLite database in WAL mode.
+
+    Every worker opens the same file, so a session created by one worker can be
+    read by any other. Queries run in a worker thread to keep the event loop free.
+    Counters are per process.
+    """
+
+    # Run the TTL/size sweep once every N puts rather than on every write
+    SWEEP_EVERY = 100
+
+    def __init__(self, path: str = SESSION_STORE_SQLITE_PATH,
+                 max_entries: int = SESSION_STORE_MAX_ENTRIES,
+                 ttl_seconds: float = SESSION_STORE_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS drill_session_refs ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_drill_session_refs_last_access"
+            " ON drill_session_refs (last_access)"
+        )
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get(self, session_id: str) -> Optional[SessionRef]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, last_access FROM drill_session_refs WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            data, last_access = row
+            if self.ttl_seconds > 0 and now - last_access > self.ttl_seconds:
+                self._conn.execute("DELETE FROM drill_session_refs WHERE session_id = ?", (session_id,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE drill_session_refs SET last_access = ? WHERE session_id = ?",
+                (now, session_id)
+            )
+            self.hits += 1
+        return SessionRef.model_validate_json(data)
+
+    def _put(self, session: SessionRef):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO drill_session_refs (session_id, data, last_access) VALUES (?, ?, ?)",
+                (session.session_id, session.model_dump_json(), time.time())
+            )
+            self._puts += 1
+            if self._puts % self.SWEEP_EVERY == 0:
+                self._sweep()
+
+    def _sweep(self):
+        if self.ttl_seconds > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM drill_session_refs WHERE last_access < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+            self.expirations += max(cursor.rowcount, 0)
+
+        # Drop the least recently used rows beyond max_entries
+        cursor = self._conn.execute(
+            "DELETE FROM drill_session_refs WHERE session_id IN ("
+            " SELECT session_id FROM drill_session_refs ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def _delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM drill_session_refs WHERE session_id = ?", (session_id,))
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM drill_session_refs").fetchone()[0]
+
+    async def get(self, session_id: str) -> Optional[SessionRef]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def put(self, session: SessionRef) -> None:
+        await asyncio.to_thread(self._put, session)
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, session_id)
+
+    async def size(self) -> int:
+        return await asyncio.to_thread(self._size)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE_BACKEND.
+    """
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE_BACKEND: {backend}")
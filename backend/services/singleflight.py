@@ -0,0 +1,57 @@
+"""
+In-flight request coalescing ("single flight").
+
+Concurrent callers asking for the same key share one execution of the
+underlying coroutine and receive the same result (or the same exception).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key. Nothing is cached once a call finishes.
+
+    The shared call runs as its own task: a caller that is cancelled (or gives
+    up at its deadline) stops waiting, but the call itself runs to completion
+    for the other callers and for any side effects such as cache writes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even when every caller stopped waiting
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `fn()` unless a call with the same key is already running, in which
+        case wait for and return that call's result.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+
+        # Shield so a cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
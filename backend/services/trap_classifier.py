@@ -0,0 +1,213 @@
+"""
+Local, deterministic trap classification for wrong answers.
+
+Two cheap signals decide which GRE trap a wrong option most likely is:
+lexicons of trap wording (absolute, causal, comparative terms) and the
+vocabulary overlap between the option and the passage (an option sharing
+little vocabulary with the passage is probably out of scope). Each guess
+carries a confidence. The local diagnosis is the last-resort fallback when the
+LLM cannot be reached. Guesses at or above TRAP_CLASSIFIER_MIN_CONFIDENCE can
+also skip the LLM, after the diagnosis cache and store have been checked; this
+shortcut is off by default because the confidences are not calibrated yet.
+
+scripts/evaluate_trap_classifier.py measures agreement with the LLM's
+diagnoses across the question bank.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+from schemas import MistakeDiagnosis, Passage, Question
+
+# Guesses at or above this confidence skip the LLM. Above 1 (the default) disables the
+# shortcut; only lower it to a value picked with scripts/evaluate_trap_classifier.py
+TRAP_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("TRAP_CLASSIFIER_MIN_CONFIDENCE", "1.1"))
+# Share of an option's content words found in the passage below which it counts as out of scope
+OUT_OF_SCOPE_MAX_OVERLAP = float(os.getenv("TRAP_CLASSIFIER_OUT_OF_SCOPE_OVERLAP", "0.35"))
+
+EXTREME_TERMS = frozenset({
+    "always", "never", "all", "none", "every", "only", "entirely", "completely",
+    "totally", "solely", "exclusively", "invariably", "must", "cannot", "impossible",
+    "certainly", "undoubtedly", "absolutely", "wholly", "universally", "nothing",
+})
+CAUSAL_TERMS = frozenset({
+    "because", "cause", "causes", "caused", "causing", "result", "results", "resulted",
+    "leads", "led", "due", "therefore", "consequently", "responsible", "produces", "produced",
+})
+COMPARISON_TERMS = frozenset({
+    "more", "less", "most", "least", "greater", "fewer", "better", "worse", "than",
+    "superior", "inferior", "primarily", "mainly",
+})
+STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "but", "nor", "of", "to", "in", "on", "at", "by", "for",
+    "with", "from", "as", "into", "about", "that", "this", "these", "those", "which", "who",
+    "whom", "whose", "what", "it", "its", "they", "them", "their", "he", "she", "his", "her",
+    "is", "are", "was", "were", "be", "been", "being", "has", "have", "had", "do", "does",
+    "did", "not", "no", "can", "could", "would", "should", "may", "might", "will", "some",
+    "any", "such", "other", "than", "then", "there", "so", "if", "also", "one", "own",
+    "author", "passage", "suggests", "suggest", "states", "implies", "argues",
+})
+
+# Questions about tone, structure or purpose have abstract options that never echo the passage
+META_QUESTION_TERMS = frozenset({
+    "tone", "attitude", "organization", "organized", "structure", "purpose", "function",
+    "primarily", "describes", "characterize", "characterizes", "role",
+})
+# Options with fewer content words than this are too short for the overlap signal to be trusted
+MIN_SCOPE_WORDS = 4
+
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+_SUFFIXES = ("ing", "ed", "es", "ly", "s")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _stem(word: str) -> str:
+    # Crude suffix stripping so "fertilized"/"fertilizing" and "ratio"/"ratios" match
+    if word.endswith("'s"):
+        word = word[:-2]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def content_stems(text: str) -> List[str]:
+    return [_stem(w) for w in tokenize(text) if w not in STOPWORDS and len(w) > 2]
+
+
+@dataclass(frozen=True)
+class TrapGuess:
+    """The classifier's verdict for one wrong option."""
+    trap_type: str
+    confidence: float
+    cue: Optional[str]  # Word that triggered the rule, if any
+    overlap: float      # Share of the option's content words found in the passage
+
+
+# trap_type -> (hint_for_retry, full_explanation) templates; {cue} is the quoted word that gave it away
+TRAP_TEMPLATES = {
+    "Extreme Language": (
+        "Watch for absolute words like {cue} and check whether the author is really that certain.",
+        "I can see why this option felt solid, but look at the word {cue}. That is a very strong claim. "
+        "Go back to the passage: does the author ever commit that absolutely, or is the language softer? "
+        "Next time an answer choice says something is always or never true, demand proof of that exact strength in the text."
+    ),
+    "Out of Scope": (
+        "Only pick an answer you can support with a specific line of the passage.",
+        "I get why this sounded reasonable, but where does the passage talk about {cue}? "
+        "This choice brings in ideas the author never discusses, so you would have to supply them from outside the text. "
+        "Next time, put your finger on the sentence that backs an answer up before you commit to it."
+    ),
+    "Correlation vs. Causation": (
+        "Check whether the passage actually says one thing causes the other, or only that they occur together.",
+        "This option builds a cause-and-effect link ({cue}). Where in the passage does the author claim that one thing "
+        "produces the other? Two ideas appearing side by side is not the same as one causing the other. "
+        "Next time, only accept a causal answer when the text states the cause outright."
+    ),
+    "Distortion": (
+        "Compare the option word by word with the lines it paraphrases; small shifts in scope or comparison matter.",
+        "This choice sounds close to the passage, but it shifts what the author said (notice {cue}). "
+        "Find the exact lines it seems to paraphrase and compare them carefully: is the comparison, degree or scope the same? "
+        "Next time, treat near-matches with suspicion and check every qualifier."
+    ),
+}
+DEFAULT_TRAP = "Distortion"
+
+
+class TrapClassifier:
+    """
+    Lexicon + passage-overlap trap classifier with per-guess confidence.
+    """
+
+    def __init__(self, min_confidence: float = TRAP_CLASSIFIER_MIN_CONFIDENCE,
+                 out_of_scope_overlap: float = OUT_OF_SCOPE_MAX_OVERLAP):
+        self.min_confidence = min_confidence
+        self.out_of_scope_overlap = out_of_scope_overlap
+        # Passage vocabulary is reused for every option of every question on it
+        self._passage_words: Dict[str, FrozenSet[str]] = {}
+        self.classified = 0
+        self.answered_locally = 0
+
+    def _passage_vocabulary(self, passage: Passage) -> FrozenSet[str]:
+        words = self._passage_words.get(passage.text)
+        if words is None:
+            tokens = tokenize(passage.text)
+            words = frozenset(tokens) | frozenset(_stem(w) for w in tokens)
+            if len(self._passage_words) >= 256:
+                self._passage_words.clear()
+            self._passage_words[passage.text] = words
+        return words
+
+    def classify(self, passage: Passage, option_text: str, question_text: str = "") -> TrapGuess:
+        """
+        Guess the trap behind choosing `option_text`. Every rule that fires
+        proposes a guess; the most confident one wins.
+        """
+        self.classified += 1
+        passage_words = self._passage_vocabulary(passage)
+        words = tokenize(option_text)
+        stems = content_stems(option_text)
+        unsupported = [s for s in stems if s not in passage_words]
+        overlap = 1.0 - len(unsupported) / len(stems) if stems else 1.0
+
+        guesses = [TrapGuess(DEFAULT_TRAP, 0.3, None, overlap)]
+
+        # Absolute wording the passage itself does not use
+        extreme = [w for w in words if w in EXTREME_TERMS and w not in passage_words]
+        if extreme:
+            guesses.append(TrapGuess("Extreme Language", 0.95 if len(extreme) > 1 else 0.9, extreme[0], overlap))
+
+        # Little shared vocabulary: the option talks about something the passage does not
+        if stems and overlap < self.out_of_scope_overlap:
+            confidence = min(0.95, 0.6 + (self.out_of_scope_overlap - overlap) * 1.5)
+            if len(stems) < MIN_SCOPE_WORDS or META_QUESTION_TERMS.intersection(tokenize(question_text)):
+                confidence = min(confidence, 0.5)
+            guesses.append(TrapGuess("Out of Scope", round(confidence, 4), unsupported[0], overlap))
+
+        causal = [w for w in words if w in CAUSAL_TERMS and w not in passage_words]
+        if causal:
+            guesses.append(TrapGuess("Correlation vs. Causation", 0.6, causal[0], overlap))
+
+        comparison = [w for w in words if w in COMPARISON_TERMS]
+        if comparison:
+            guesses.append(TrapGuess("Distortion", 0.5, comparison[0], overlap))
+
+        return max(guesses, key=lambda g: g.confidence)
+
+    def diagnosis(self, guess: TrapGuess) -> MistakeDiagnosis:
+        hint, explanation = TRAP_TEMPLATES[guess.trap_type]
+        cue = f"'{guess.cue}'" if guess.cue else "its wording"
+        return MistakeDiagnosis(
+            trap_type=guess.trap_type,
+            hint_for_retry=hint.format(cue=cue),
+            full_explanation=explanation.format(cue=cue)
+        )
+
+    def diagnose(self, passage: Passage, question: Question, wrong_option: str) -> MistakeDiagnosis:
+        """
+        Spoiler-free diagnosis for choosing `wrong_option`, however unsure the guess.
+        """
+        return self.diagnosis(self.classify(passage, question.options.get(wrong_option, wrong_option), question.text))
+
+    def confident_diagnosis(self, passage: Passage, question: Question,
+                            wrong_option: str) -> Optional[MistakeDiagnosis]:
+        """
+        The local diagnosis if the guess is confident enough to skip the LLM, else None.
+        """
+        guess = self.classify(passage, question.options.get(wrong_option, wrong_option), question.text)
+        if guess.confidence < self.min_confidence:
+            return None
+        self.answered_locally += 1
+        return self.diagnosis(guess)
+
+    def stats(self) -> Dict[str, int]:
+        return {"classified": self.classified, "answered_locally": self.answered_locally}
+
+
+# Singleton instance
+trap_classifier = TrapClassifier()
@@ -5,6 +5,18 @@
 
 const API_BASE_URL = 'http://localhost:8000';
 
+/**
+ * JSON headers, plus the bearer token when the user is logged in
+ * (drill endpoints use it to link sessions to the account)
+ * @returns {Object} Request headers
+ */
+function drillHeaders() {
+  const token = localStorage.getItem('gre_token');
+  return token
+    ? { 'Content-Type': 'application/json', 'Authorization': `Bearer ${token}` }
+    : { 'Content-Type': 'application/json' };
+}
+
 /**
  * Generate a new GRE session
  * @param {Object} params
@@ -15,7 +27,7 @@ const API_BASE_URL = 'http://localhost:8000';
 export async function generateSession({ difficulty, exam_date }) {
   const response = await fetch(`${API_BASE_URL}/generate-session`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: drillHeaders(),
     body: JSON.stringify({ difficulty, exam_date })
   });
 
@@ -36,7 +48,7 @@ export async function generateSession({ difficulty, exam_date }) {
 export async function analyzeMistakes({ session_id, answers }) {
   const response = await fetch(`${API_BASE_URL}/analyze-mistakes`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: drillHeaders(),
     body: JSON.stringify({ session_id, answers })
   });
 
@@ -47,6 +59,48 @@ export async function analyzeMistakes({ session_id, answers }) {
   return response.json();
 }
 
+/**
+ * Stream mistake analyses as they finish (newline-delimited JSON)
+ * @param {Object} params
+ * @param {string} params.session_id
+ * @param {Object} params.answers - Map of question_id -> selected_option
+ * @param {Function} onAnalysis - Called with each mistake diagnosis as it arrives
+ * @returns {Promise<Array>} All mistake diagnoses, in arrival order
+ */
+export async function streamMistakeAnalyses({ session_id, answers }, onAnalysis) {
+  const response = await fetch(`${API_BASE_URL}/analyze-mistakes/stream`, {
+    method: 'POST',
+    headers: drillHeaders(),
+    body: JSON.stringify({ session_id, answers })
+  });
+
+  if (!response.ok) {
+    throw new Error(`Failed to analyze mistakes: ${response.statusText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const analyses = [];
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const analysis = JSON.parse(line);
+      analyses.push(analysis);
+      if (onAnalysis) onAnalysis(analysis);
+    }
+  }
+
+  return analyses;
+}
+
 /**
  * Generate session summary
  * @param {Object} params
@@ -60,7 +114,7 @@ export async function analyzeMistakes({ session_id, answers }) {
 export async function getSessionSummary({ session_id, original_score, final_mastery, traps_identified, exam_date }) {
   const response = await fetch(`${API_BASE_URL}/session-summary`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
+    headers: drillHeaders(),
     body: JSON.stringify({ session_id, original_score, final_mastery, traps_identified, exam_date })
   });
 
@@ -71,6 +125,54 @@ export async function getSessionSummary({ session_id, original_score, final_mast
   return response.json();
 }
 
+/**
+ * Stream the session summary while the coach message is generated
+ * @param {Object} params - Same fields as getSessionSummary
+ * @param {Function} onDelta - Called with (field, text) as headline/body text arrives
+ * @returns {Promise<Object>} Final summary with coach message (rejects if generation fails mid-stream)
+ */
+export async function streamSessionSummary({ session_id, original_score, final_mastery, traps_identified, exam_date }, onDelta) {
+  const response = await fetch(`${API_BASE_URL}/session-summary/stream`, {
+    method: 'POST',
+    headers: drillHeaders(),
+    body: JSON.stringify({ session_id, original_score, final_mastery, traps_identified, exam_date })
+  });
+
+  if (!response.ok) {
+    throw new Error(`Failed to get summary: ${response.statusText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let summary = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line);
+      if (event.type === 'delta') {
+        if (onDelta) onDelta(event.field, event.text);
+      } else if (event.type === 'summary') {
+        summary = event.summary;
+      } else if (event.type === 'error') {
+        throw new Error(event.detail);
+      }
+    }
+  }
+
+  if (!summary) {
+    throw new Error('Summary stream ended without a result');
+  }
+  return summary;
+}
+
 /**
  * Register a new user
  * @param {Object} userData